@@ -3,8 +3,8 @@
 # ----------------------------------------------------------------------------#
 
 import json
+import click
 import dateutil.parser
-import babel
 from flask import (
     Flask,
     render_template,
@@ -14,29 +14,38 @@ from flask import (
     redirect,
     url_for,
     jsonify,
+    abort,
 )
 import logging
 from logging import Formatter, FileHandler
 from flask_wtf import Form
 from forms import *
-from models import db, Venue, Artist, Show, app
+from models import db, Venue, Artist, Show, app, set_genres
+from listings import (
+    venue_areas,
+    artist_list,
+    venue_detail,
+    artist_detail,
+    shows_feed,
+    artist_ids_for_venue,
+    venue_ids_for_artist,
+)
+from cache import PageCache, store_from_config
+from search import search
+from formatting import format_datetime, format_show_times
+from importer import Importer, read_records
 
 # ----------------------------------------------------------------------------#
 # Filters.
 # ----------------------------------------------------------------------------#
 
 
-def format_datetime(value, format="medium"):
-    date = dateutil.parser.parse(value)
-    if format == "full":
-        format = "EEEE MMMM, d, y 'at' h:mma"
-    elif format == "medium":
-        format = "EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format)
-
-
 app.jinja_env.filters["datetime"] = format_datetime
 
+page_cache = PageCache(
+    store_from_config(app.config), app.config["PAGE_CACHE_TTL"]
+)
+
 # ----------------------------------------------------------------------------#
 # Controllers.
 # ----------------------------------------------------------------------------#
@@ -52,104 +61,49 @@ def index():
 
 
 @app.route("/venues")
+@page_cache.cached("venues")
 def venues():
-    data = []
-    # get the venues with future shows
-    venues = db.session.query(Venue).all()
-
-    # create a set of different locations
-    locations = set()
-    for venue in venues:
-        upcoming_shows = 0
-        for show in venue.shows:
-            if show.start_time < datetime.now():
-                continue
-
-            upcoming_shows += 1
-
-        if venue.city not in locations:
-            locations.add(venue.city)
-            data.append(
-                {
-                    "city": venue.city,
-                    "state": venue.state,
-                    "venues": [
-                        {
-                            "id": venue.id,
-                            "name": venue.name,
-                            "num_upcoming_shows": upcoming_shows,
-                        }
-                    ],
-                }
-            )
-        else:
-            for item in data:
-                if item["city"] == venue.city:
-                    item["venues"].append(
-                        {
-                            "id": venue.id,
-                            "name": venue.name,
-                            "num_upcoming_shows": upcoming_shows,
-                        }
-                    )
-
+    data = venue_areas(
+        genre=request.args.get("genre"),
+        city=request.args.get("city"),
+        state=request.args.get("state"),
+    )
     return render_template("pages/venues.html", areas=data)
 
 
 @app.route("/venues/search", methods=["POST"])
 def search_venues():
-    search = request.form.get("search_term", "")
-    look_for = "%{0}%".format(search)
-    result = Venue.query.filter(Venue.name.ilike(look_for)).all()
-    response = {"count": len(result), "data": result}
+    search_term = request.form.get("search_term", "")
+    page = max(request.form.get("page", 1, type=int), 1)
+    count, data = search(
+        Venue,
+        search_term,
+        page,
+        app.config["SEARCH_RESULTS_PER_PAGE"],
+        genre=request.form.get("genre"),
+    )
+    response = {
+        "count": count,
+        "data": data,
+        "page": page,
+        "has_next": page * app.config["SEARCH_RESULTS_PER_PAGE"] < count,
+        "genre": request.form.get("genre", ""),
+    }
     return render_template(
-        "pages/search_venues.html", results=response, search_term=search
+        "pages/search_venues.html", results=response, search_term=search_term
     )
 
 
 @app.route("/venues/<int:venue_id>")
+@page_cache.cached("show_venue")
 def show_venue(venue_id):
-    data = {}
-    venue = Venue.query.get(venue_id)
-    if not venue:
-        return render_template("pages/show_venue.html", venue=data)
-    # copy all the object to a dict
-    data.update(venue.__dict__)
-
-    # handle the genres
-    genres = venue.genres.split(",")
-    data["genres"] = genres
-
-    # handle past and upcoming shows
-    data.update(
-        {
-            "past_shows": [],
-            "upcoming_shows": [],
-            "past_shows_count": 0,
-            "upcoming_shows_count": 0,
-        }
+    past_page = max(request.args.get("past_page", 1, type=int), 1)
+    data = venue_detail(
+        venue_id, past_page, app.config["PAST_SHOWS_PER_PAGE"]
     )
-
-    past = 0
-    upcoming = 0
-    for show in venue.shows:
-        show_details = {
-            "artist_id": show.artist_id,
-            "artist_name": show.artist.name,
-            "artist_image_link": show.artist.image_link,
-            "start_time": show.start_time,
-        }
-        if show.start_time > datetime.now():
-            upcoming += 1
-            data["upcoming_shows"].append(show_details)
-        else:
-            past += 1
-            data["past_shows"].append(show_details)
-
-    data["past_shows_count"] = past
-    data["upcoming_shows_count"] = upcoming
-
-    return render_template("pages/show_venue.html", venue=data)
+    if data:
+        format_show_times(data["past_shows"] + data["upcoming_shows"])
+    return render_template("pages/show_venue.html", venue=data or {})
 
 
 #  Create Venue
@@ -167,7 +121,6 @@ def create_venue_submission():
     try:
         data = request.form
         name = data["name"]
-        genres = ",".join(data.getlist("genres"))
         city = data["city"]
         state = data["state"]
         address = data["address"]
@@ -176,16 +129,18 @@ def create_venue_submission():
 
         venue = Venue(
             name=name,
-            genres=genres,
             city=city,
             state=state,
             address=address,
             phone=phone,
             facebook_link=facebook_link,
         )
+        set_genres(venue, data.getlist("genres"))
 
         db.session.add(venue)
         db.session.commit()
+        page_cache.invalidate("venues")
+        page_cache.invalidate("show_venue", venue.id)
         # on successful db insert, flash success
         flash("Venue " + request.form["name"] + " was successfully listed!")
     except Exception as e:
@@ -205,9 +160,13 @@ def delete_venue(venue_id):
         flash("Venue was not foud")
 
     name = venue.name
+    artist_ids = artist_ids_for_venue(venue.id)
     try:
         db.session.delete(venue)
         db.session.commit()
+        page_cache.invalidate("venues")
+        page_cache.invalidate("show_venue", venue_id)
+        page_cache.invalidate_many("show_artist", artist_ids)
         flash("Venue " + name + " was deleted")
     except Exception as e:
         db.session.rollback()
@@ -221,66 +180,49 @@ def delete_venue(venue_id):
 #  Artists
 #  ----------------------------------------------------------------
 @app.route("/artists")
+@page_cache.cached("artists")
 def artists():
-    data = db.session.query(Artist.id, Artist.name).all()
-
+    data = artist_list(
+        genre=request.args.get("genre"),
+        city=request.args.get("city"),
+        state=request.args.get("state"),
+    )
     return render_template("pages/artists.html", artists=data)
 
 
 @app.route("/artists/search", methods=["POST"])
 def search_artists():
-    search = request.form.get("search_term", "")
-    look_for = "%{0}%".format(search)
-    result = Artist.query.filter(Artist.name.ilike(look_for)).all()
-    response = {"count": len(result), "data": result}
+    search_term = request.form.get("search_term", "")
+    page = max(request.form.get("page", 1, type=int), 1)
+    count, data = search(
+        Artist,
+        search_term,
+        page,
+        app.config["SEARCH_RESULTS_PER_PAGE"],
+        genre=request.form.get("genre"),
+    )
+    response = {
+        "count": count,
+        "data": data,
+        "page": page,
+        "has_next": page * app.config["SEARCH_RESULTS_PER_PAGE"] < count,
+        "genre": request.form.get("genre", ""),
+    }
     return render_template(
-        "pages/search_artists.html", results=response, search_term=search
+        "pages/search_artists.html", results=response, search_term=search_term
     )
 
 
 @app.route("/artists/<int:artist_id>")
+@page_cache.cached("show_artist")
 def show_artist(artist_id):
-    data = {}
-    artist = Artist.query.get(artist_id)
-    if not artist:
-        return render_template("pages/show_artist.html", artist=data)
-
-    # copy all the object to a dict
-    data.update(artist.__dict__)
-
-    # handle the genres
-    genres = artist.genres.split(",")
-    data["genres"] = genres
-
-    # handle past and upcoming shows
-    data.update(
-        {
-            "past_shows": [],
-            "upcoming_shows": [],
-            "past_shows_count": 0,
-            "upcoming_shows_count": 0,
-        }
+    past_page = max(request.args.get("past_page", 1, type=int), 1)
+    data = artist_detail(
+        artist_id, past_page, app.config["PAST_SHOWS_PER_PAGE"]
     )
-
-    past = 0
-    upcoming = 0
-    for show in artist.shows:
-        show_details = {
-            "venue_id": show.venue_id,
-            "venue_name": show.venue.name,
-            "venue_image_link": show.venue.image_link,
-            "start_time": show.start_time,
-        }
-        if show.start_time > datetime.now():
-            upcoming += 1
-            data["upcoming_shows"].append(show_details)
-        else:
-            past += 1
-            data["past_shows"].append(show_details)
-
-    data["past_shows_count"] = past
-    data["upcoming_shows_count"] = upcoming
-    return render_template("pages/show_artist.html", artist=data)
+    if data:
+        format_show_times(data["past_shows"] + data["upcoming_shows"])
+    return render_template("pages/show_artist.html", artist=data or {})
 
 
 #  Update
@@ -288,8 +230,8 @@ def show_artist(artist_id):
 @app.route("/artists/<int:artist_id>/edit", methods=["GET"])
 def edit_artist(artist_id):
     artist = Artist.query.get(artist_id)
-    artist.genres = artist.genres.split(",")
     form = ArtistForm(obj=artist)
+    form.genres.data = [genre.name for genre in artist.genre_list]
 
     return render_template("forms/edit_artist.html", form=form, artist=artist)
 
@@ -304,10 +246,15 @@ def edit_artist_submission(artist_id):
         artist.phone = data["phone"]
         artist.state = data["state"]
         artist.city = data["city"]
-        artist.genres = ",".join(data.getlist("genres"))
+        set_genres(artist, data.getlist("genres"))
         artist.facebook_link = data["facebook_link"]
 
         db.session.commit()
+        page_cache.invalidate("artists")
+        page_cache.invalidate("show_artist", artist_id)
+        page_cache.invalidate_many(
+            "show_venue", venue_ids_for_artist(artist_id)
+        )
         flash(
           "The Artist " + request.form["name"]
           + " has been successfully updated!"
@@ -326,8 +273,8 @@ def edit_artist_submission(artist_id):
 @app.route("/venues/<int:venue_id>/edit", methods=["GET"])
 def edit_venue(venue_id):
     venue = Venue.query.get(venue_id)
-    venue.genres = venue.genres.split(",")
     form = VenueForm(obj=venue)
+    form.genres.data = [genre.name for genre in venue.genre_list]
 
     return render_template("forms/edit_venue.html", form=form, venue=venue)
 
@@ -343,10 +290,15 @@ def edit_venue_submission(venue_id):
         venue.state = data["state"]
         venue.city = data["city"]
         venue.address = data["address"]
-        venue.genres = ",".join(data.getlist("genres"))
+        set_genres(venue, data.getlist("genres"))
         venue.facebook_link = data["facebook_link"]
 
         db.session.commit()
+        page_cache.invalidate("venues")
+        page_cache.invalidate("show_venue", venue_id)
+        page_cache.invalidate_many(
+            "show_artist", artist_ids_for_venue(venue_id)
+        )
         flash(
           "The Venue " + request.form["name"] +
           " has been successfully updated!"
@@ -376,7 +328,6 @@ def create_artist_submission():
     try:
         data = request.form
         name = data["name"]
-        genres = ",".join(data.getlist("genres"))
         city = data["city"]
         state = data["state"]
         phone = data["phone"]
@@ -384,15 +335,17 @@ def create_artist_submission():
 
         artist = Artist(
             name=name,
-            genres=genres,
             city=city,
             state=state,
             phone=phone,
             facebook_link=facebook_link,
         )
+        set_genres(artist, data.getlist("genres"))
 
         db.session.add(artist)
         db.session.commit()
+        page_cache.invalidate("artists")
+        page_cache.invalidate("show_artist", artist.id)
         # on successful db insert, flash success
         flash(
           "Artist " + request.form["name"] + " was successfully listed!"
@@ -412,21 +365,34 @@ def create_artist_submission():
 #  ----------------------------------------------------------------
 
 
+def parse_date_arg(name):
+    value = request.args.get(name)
+    return dateutil.parser.parse(value) if value else None
+
+
 @app.route("/shows")
 def shows():
-    data = []
-    upcoming_shows = db.session.query(Show).all()
-    for show in upcoming_shows:
-        data.append(
-            {
-                "venue_id": show.venue_id,
-                "venue_name": show.venue.name,
-                "artist_id": show.artist_id,
-                "artist_image_link": show.artist.image_link,
-                "start_time": show.start_time,
-            }
+    filters = {
+        key: request.args[key]
+        for key in ("upcoming", "start", "end")
+        if request.args.get(key)
+    }
+    try:
+        data, next_cursor = shows_feed(
+            app.config["SHOWS_PER_PAGE"],
+            after=request.args.get("after") or None,
+            upcoming_only=filters.get("upcoming") == "1",
+            start=parse_date_arg("start"),
+            end=parse_date_arg("end"),
         )
-    return render_template("pages/shows.html", shows=data)
+    except (ValueError, OverflowError):
+        abort(400)
+
+    next_url = None
+    if next_cursor:
+        next_url = url_for("shows", after=next_cursor, **filters)
+    format_show_times(data)
+    return render_template("pages/shows.html", shows=data, next_url=next_url)
 
 
 @app.route("/shows/create")
@@ -449,6 +415,9 @@ def create_show_submission():
 
         db.session.add(show)
         db.session.commit()
+        page_cache.invalidate("venues")
+        page_cache.invalidate("show_venue", venue_id)
+        page_cache.invalidate("show_artist", artist_id)
         # on successful db insert, flash success
         flash("Show was successfully listed!")
     except Exception as e:
@@ -460,6 +429,50 @@ def create_show_submission():
     return render_template("pages/home.html")
 
 
+#  Monitoring
+#  ----------------------------------------------------------------
+
+
+@app.route("/cache/stats")
+def cache_stats():
+    return jsonify(page_cache.stats())
+
+
+#  Bulk import
+#  ----------------------------------------------------------------
+
+
+@app.cli.command("import-data")
+@click.argument("kind", type=click.Choice(sorted(Importer.KINDS)))
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--batch-size", default=500, show_default=True)
+@click.option(
+    "--rejects",
+    type=click.File("w"),
+    help="Write rejected records as JSON Lines to this file.",
+)
+def import_data(kind, path, batch_size, rejects):
+    """Load venues, artists or shows from a .csv or JSON Lines file."""
+    def progress(importer):
+        click.echo(
+            "{}: {} loaded, {} rejected, {:.0f} rows/s".format(
+                kind,
+                importer.loaded,
+                importer.rejected,
+                importer.rows_per_second,
+            )
+        )
+
+    with app.test_request_context():
+        importer = Importer(kind, batch_size, rejects, progress).run(
+            read_records(path)
+        )
+    page_cache.clear()
+    # flush() reports after every batch; only an empty run needs a line
+    if not importer.batches:
+        progress(importer)
+
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template("errors/404.html"), 404
@@ -0,0 +1,250 @@
+"""Page latency benchmarks for Fyyur against a seeded throwaway database.
+
+    python bench.py venues
+    python bench.py venues --sizes 100,1000,10000
+
+Every run seeds a fresh SQLite file (or whatever DATABASE_URL points at)
+and reports the average latency of each page for every dataset size.
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import dateutil.parser
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = "sqlite:///{}".format(
+        os.path.join(tempfile.mkdtemp(), "fyyur_bench.db")
+    )
+
+from app import app, page_cache  # noqa: E402
+from models import (  # noqa: E402
+    db,
+    Venue,
+    Artist,
+    Show,
+    Genre,
+    venue_genres,
+    artist_genres,
+)
+import formatting  # noqa: E402
+import search  # noqa: E402
+
+DEFAULT_SIZES = [100, 1000, 10000]
+CITIES = [
+    ("San Francisco", "CA"),
+    ("New York", "NY"),
+    ("Austin", "TX"),
+    ("Seattle", "WA"),
+    ("Chicago", "IL"),
+]
+REPEAT = 5
+
+
+def seed(num_venues, shows_per_venue=4, upcoming_per_venue=None):
+    """Recreate the schema and fill it with num_venues venues and artists.
+
+    Every venue gets shows_per_venue shows, upcoming_per_venue of them
+    (half by default) in the future.
+    """
+    if upcoming_per_venue is None:
+        upcoming_per_venue = shows_per_venue // 2
+    db.drop_all()
+    db.create_all()
+    now = datetime.now()
+
+    db.session.bulk_insert_mappings(
+        Venue,
+        [
+            {
+                "id": i,
+                "name": "Venue {}".format(i),
+                "genres": "Jazz,Rock n Roll",
+                "city": CITIES[i % len(CITIES)][0],
+                "state": CITIES[i % len(CITIES)][1],
+                "address": "{} Main St".format(i),
+            }
+            for i in range(1, num_venues + 1)
+        ],
+    )
+    db.session.bulk_insert_mappings(
+        Artist,
+        [
+            {
+                "id": i,
+                "name": "Artist {}".format(i),
+                "genres": "Jazz,Soul",
+                "city": CITIES[i % len(CITIES)][0],
+                "state": CITIES[i % len(CITIES)][1],
+            }
+            for i in range(1, num_venues + 1)
+        ],
+    )
+    db.session.bulk_insert_mappings(
+        Genre,
+        [
+            {"id": 1, "name": "Jazz"},
+            {"id": 2, "name": "Rock n Roll"},
+            {"id": 3, "name": "Soul"},
+        ],
+    )
+    db.session.execute(
+        venue_genres.insert(),
+        [
+            {"venue_id": i, "genre_id": genre_id}
+            for i in range(1, num_venues + 1)
+            for genre_id in (1, 2)
+        ],
+    )
+    db.session.execute(
+        artist_genres.insert(),
+        [
+            {"artist_id": i, "genre_id": genre_id}
+            for i in range(1, num_venues + 1)
+            for genre_id in (1, 3)
+        ],
+    )
+    db.session.bulk_insert_mappings(
+        Show,
+        [
+            {
+                "venue_id": i,
+                "artist_id": (i + j) % num_venues + 1,
+                "start_time": now + timedelta(
+                    days=j - shows_per_venue + upcoming_per_venue, hours=1
+                ),
+            }
+            for i in range(1, num_venues + 1)
+            for j in range(shows_per_venue)
+        ],
+    )
+    db.session.commit()
+    # bulk inserts skip the mapper events that keep the index current
+    for index in search.indexes.values():
+        index.reset()
+
+
+def time_call(func, repeat=REPEAT):
+    """Average wall time in milliseconds of func(), after one warm-up call."""
+    func()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def time_get(client, url, repeat=REPEAT, cached=False):
+    """Average wall time in milliseconds of GET url.
+
+    Unless cached is set the page cache is emptied before every request,
+    so the page is rendered from the database each time.
+    """
+    def get():
+        if not cached:
+            page_cache.clear()
+        response = client.get(url)
+        assert response.status_code == 200, response.status
+
+    return time_call(get, repeat)
+
+
+def bench_venues(client, size):
+    return time_get(client, "/venues")
+
+
+def bench_venues_cached(client, size):
+    return time_get(client, "/venues", cached=True)
+
+
+def bench_venues_by_genre(client, size):
+    return time_get(client, "/venues?genre=Jazz&state=NY")
+
+
+def bench_show_venue(client, size):
+    return time_get(client, "/venues/1")
+
+
+def bench_show_artist(client, size):
+    return time_get(client, "/artists/1")
+
+
+def bench_shows(client, size):
+    return time_get(client, "/shows")
+
+
+def bench_search(client, size):
+    def post():
+        response = client.post("/venues/search", data={"search_term": "ue 12"})
+        assert response.status_code == 200, response.status
+
+    return time_call(post)
+
+
+def bench_search_ilike(client, size):
+    """The unindexed, unbounded name ILIKE the search used to run."""
+    return time_call(
+        lambda: Venue.query.filter(Venue.name.ilike("%ue 12%")).all()
+    )
+
+
+def bench_format_datetime(client, size):
+    """The old filter: dateutil parse plus Babel pattern per value."""
+    from babel.dates import format_datetime
+
+    start = datetime(2020, 1, 1)
+    values = [str(start + timedelta(hours=i)) for i in range(size)]
+
+    def format_all():
+        for value in values:
+            format_datetime(
+                dateutil.parser.parse(value),
+                formatting.FORMATS["full"],
+                locale=formatting.DEFAULT_LOCALE,
+            )
+
+    return time_call(format_all)
+
+
+def bench_format_show_times(client, size):
+    starts = [datetime(2020, 1, 1) + timedelta(hours=i) for i in range(size)]
+    return time_call(
+        lambda: formatting.format_show_times(
+            [{"start_time": start} for start in starts]
+        )
+    )
+
+
+BENCHMARKS = {
+    "venues": bench_venues,
+    "venues_cached": bench_venues_cached,
+    "venues_by_genre": bench_venues_by_genre,
+    "show_venue": bench_show_venue,
+    "show_artist": bench_show_artist,
+    "shows": bench_shows,
+    "search": bench_search,
+    "search_ilike": bench_search_ilike,
+    "format_datetime": bench_format_datetime,
+    "format_show_times": bench_format_show_times,
+}
+
+
+def main(argv):
+    sizes = DEFAULT_SIZES
+    if "--sizes" in argv:
+        index = argv.index("--sizes")
+        sizes = [int(n) for n in argv[index + 1].split(",")]
+        argv = argv[:index] + argv[index + 2:]
+    names = argv or list(BENCHMARKS)
+
+    client = app.test_client()
+    for size in sizes:
+        seed(size)
+        for name in names:
+            elapsed = BENCHMARKS[name](client, size)
+            print("{:<12} {:>8} rows {:>10.2f} ms".format(name, size, elapsed))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
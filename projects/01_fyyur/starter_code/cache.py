@@ -0,0 +1,151 @@
+"""Rendered page cache for the read-mostly Fyyur pages.
+
+Pages are cached by route and entity id, e.g. "show_venue:3", and are
+dropped by the create, edit and delete handlers right after they
+commit. Entries also expire after a TTL. By default the pages live in
+an in-process LRU. Setting PAGE_CACHE_REDIS_URL moves them to a Redis
+compatible server, so that every worker shares them.
+"""
+import time
+from collections import OrderedDict
+from functools import wraps
+from threading import Lock
+
+from flask import request, session
+
+
+class LRUStore:
+    """In-process, size bounded LRU mapping with per entry expiry."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class RedisStore:
+    """Store backed by a Redis compatible server through a redis-py client."""
+
+    def __init__(self, client, prefix="fyyur:"):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return value.decode("utf-8") if value is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, value.encode("utf-8"), ex=ttl)
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*(self.prefix + key for key in keys))
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+def store_from_config(config):
+    url = config.get("PAGE_CACHE_REDIS_URL")
+    if url:
+        import redis
+
+        return RedisStore(redis.Redis.from_url(url))
+    return LRUStore(config["PAGE_CACHE_SIZE"])
+
+
+def page_key(route, *ids):
+    return ":".join([route] + [str(entity_id) for entity_id in ids])
+
+
+class PageCache:
+    """Caches the HTML rendered by views, keyed by route and entity id."""
+
+    def __init__(self, store, ttl=300):
+        self.store = store
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def cached(self, route):
+        """Decorator caching the view's page under route and its url args.
+
+        Requests with a query string or with flashed messages waiting to
+        be shown are rendered fresh and not stored.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(**kwargs):
+                if request.query_string or session.get("_flashes"):
+                    return view(**kwargs)
+
+                key = page_key(route, *kwargs.values())
+                page = self.store.get(key)
+                if page is not None:
+                    self.hits += 1
+                    return page
+
+                self.misses += 1
+                page = view(**kwargs)
+                if isinstance(page, str):
+                    self.store.set(key, page, self.ttl)
+                return page
+
+            return wrapper
+
+        return decorator
+
+    def invalidate(self, route, *ids):
+        self.invalidations += 1
+        self.store.delete(page_key(route, *ids))
+
+    def invalidate_many(self, route, ids):
+        ids = list(ids)
+        self.invalidations += len(ids)
+        self.store.delete(*(page_key(route, entity_id) for entity_id in ids))
+
+    def clear(self):
+        self.store.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
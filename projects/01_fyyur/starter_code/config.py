@@ -11,5 +11,22 @@ DEBUG = True
 
 
 # TODO IMPLEMENT DATABASE URL
-SQLALCHEMY_DATABASE_URI = "postgres://beshoy@localhost:5432/fyyur"
+SQLALCHEMY_DATABASE_URI = os.environ.get(
+    "DATABASE_URL", "postgres://beshoy@localhost:5432/fyyur"
+)
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Past shows rendered per page on the venue and artist detail pages
+PAST_SHOWS_PER_PAGE = 20
+
+# Shows rendered per page of the /shows feed
+SHOWS_PER_PAGE = 30
+
+# Results rendered per page of the venue and artist search
+SEARCH_RESULTS_PER_PAGE = 20
+
+# Rendered page cache. Pages are kept in an in-process LRU unless a Redis
+# compatible server is configured.
+PAGE_CACHE_TTL = 300
+PAGE_CACHE_SIZE = 1024
+PAGE_CACHE_REDIS_URL = os.environ.get("PAGE_CACHE_REDIS_URL")
@@ -0,0 +1,106 @@
+"""Check that the hot Fyyur queries use index scans on the show table.
+
+    python explain_check.py
+    DATABASE_URL=postgres://localhost:5432/fyyur_check python explain_check.py
+
+Seeds a throwaway database the way bench.py does, captures the SQL the
+venues, show_venue, show_artist and shows pages run, and inspects the
+EXPLAIN output of every statement that reads the show table. Exits with
+status 1 if any of them falls back to a sequential scan of show.
+"""
+import re
+import sys
+from datetime import datetime
+
+from sqlalchemy import event
+
+import bench
+import listings
+from app import app
+from models import db
+
+NUM_VENUES = 2000
+SHOWS_PER_VENUE = 20
+UPCOMING_PER_VENUE = 2
+
+HOT_QUERIES = {
+    "venues": lambda: listings.venue_areas(),
+    "show_venue": lambda: listings.venue_detail(1, 1, 20),
+    "show_artist": lambda: listings.artist_detail(1, 1, 20),
+    "shows": lambda: listings.shows_feed(30, upcoming_only=True),
+    "shows_next_page": lambda: listings.shows_feed(
+        30, after=listings.encode_show_cursor(datetime.now(), 1)
+    ),
+}
+
+READS_SHOW = re.compile(r"\bshow\b")
+SQLITE_SHOW_SCAN = re.compile(r"^SCAN (TABLE )?show\b")
+
+
+def capture(func):
+    """Run func and return the (statement, parameters) it executed."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context,
+                              executemany):
+        statements.append((statement, parameters))
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        func()
+    finally:
+        event.remove(
+            db.engine, "before_cursor_execute", before_cursor_execute
+        )
+    return statements
+
+
+def explain(statement, parameters):
+    """Plan lines of statement, run on a raw DBAPI connection."""
+    sqlite = db.engine.dialect.name == "sqlite"
+    prefix = "EXPLAIN QUERY PLAN " if sqlite else "EXPLAIN "
+    connection = db.engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(prefix + statement, parameters)
+        return [row[-1] if sqlite else row[0] for row in cursor.fetchall()]
+    finally:
+        connection.close()
+
+
+def scans_show(plan):
+    """Whether a plan reads the show table without an index."""
+    if db.engine.dialect.name == "sqlite":
+        return any(
+            SQLITE_SHOW_SCAN.match(line) and "USING" not in line
+            for line in plan
+        )
+    return any("Seq Scan on show" in line for line in plan)
+
+
+def main():
+    bench.seed(NUM_VENUES, SHOWS_PER_VENUE, UPCOMING_PER_VENUE)
+    db.session.execute("ANALYZE")
+    db.session.commit()
+
+    failures = 0
+    for name, query in HOT_QUERIES.items():
+        for statement, parameters in capture(query):
+            if not READS_SHOW.search(statement):
+                continue
+            plan = explain(statement, parameters)
+            ok = not scans_show(plan)
+            failures += not ok
+            print("{:<16} {}".format(name, "index" if ok else "SEQ SCAN"))
+            if not ok:
+                print("\n".join("    " + line for line in plan))
+
+    if failures:
+        print("{} statements scan the show table".format(failures))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    with app.app_context():
+        sys.exit(main())
@@ -0,0 +1,64 @@
+"""Date formatting for the Fyyur templates.
+
+Babel rebuilds its pattern and looks up the locale on every
+format_datetime() call. Here both are compiled once per format and
+locale. Values that are already datetimes are formatted without being
+parsed again.
+"""
+from datetime import datetime
+from functools import lru_cache
+
+import dateutil.parser
+from babel.core import Locale
+from babel.dates import LC_TIME, parse_pattern
+
+FORMATS = {
+    "full": "EEEE MMMM, d, y 'at' h:mma",
+    "medium": "EE MM, dd, y h:mma",
+}
+DEFAULT_LOCALE = LC_TIME or "en_US"
+
+
+@lru_cache(maxsize=64)
+def compiled_pattern(format):
+    return parse_pattern(FORMATS.get(format, format))
+
+
+@lru_cache(maxsize=16)
+def get_locale(name):
+    return Locale.parse(name)
+
+
+def to_datetime(value):
+    if isinstance(value, datetime):
+        return value
+    return dateutil.parser.parse(value)
+
+
+def format_datetime(value, format="medium", locale=DEFAULT_LOCALE):
+    """The templates' datetime filter.
+
+    value is a datetime or a string holding one, format one of FORMATS
+    or a Babel pattern.
+    """
+    pattern = compiled_pattern(format)
+    return pattern.apply(to_datetime(value), get_locale(locale))
+
+
+def format_show_times(shows, format="full", locale=DEFAULT_LOCALE,
+                      key="start_time"):
+    """Replace the start time of every show dict with its formatted text.
+
+    The pattern and locale are resolved once for the whole list, and
+    shows sharing a start time are formatted only once.
+    """
+    pattern = compiled_pattern(format)
+    locale = get_locale(locale)
+    formatted = {}
+    for show in shows:
+        value = show[key]
+        text = formatted.get(value)
+        if text is None:
+            text = formatted[value] = pattern.apply(to_datetime(value), locale)
+        show[key] = text
+    return shows
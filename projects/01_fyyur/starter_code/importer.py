@@ -0,0 +1,273 @@
+"""Bulk loading of venues, artists and shows from CSV or JSON Lines files.
+
+Records are streamed from the file and validated with the same forms
+the create pages use. Valid rows are written with multi-row INSERTs,
+one transaction per batch. When a batch fails, its rows are retried one
+at a time so that only the offending records are rejected.
+"""
+import csv
+import json
+import time
+
+from werkzeug.datastructures import MultiDict
+
+from forms import VenueForm, ArtistForm, ShowForm
+from models import (
+    db,
+    Venue,
+    Artist,
+    Show,
+    venue_genres,
+    artist_genres,
+    genres_by_name,
+)
+
+# SQLite rejects statements with more bound parameters than this
+SQLITE_MAX_PARAMS = 999
+
+
+def read_records(path):
+    """Yield the records of a .csv file, or of a JSON Lines file."""
+    if path.endswith(".csv"):
+        with open(path, newline="") as f:
+            for record in csv.DictReader(f):
+                yield record
+    else:
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def form_data(record):
+    """Form data for a record; genres may be a list or comma separated."""
+    data = MultiDict()
+    for key, value in record.items():
+        if value is None:
+            continue
+        if key == "genres":
+            if isinstance(value, str):
+                value = value.split(",")
+            for genre in value:
+                data.add(key, genre.strip())
+        else:
+            data.add(key, str(value))
+    return data
+
+
+def insert_rows(table, rows):
+    """INSERT rows with as few multi-row statements as the database allows."""
+    per_statement = len(rows)
+    if db.engine.dialect.name == "sqlite":
+        per_statement = max(1, SQLITE_MAX_PARAMS // len(rows[0]))
+    for start in range(0, len(rows), per_statement):
+        db.session.execute(
+            table.insert().values(rows[start:start + per_statement])
+        )
+
+
+class Importer:
+    """Loads one kind of record: "venues", "artists" or "shows"."""
+
+    KINDS = {
+        "venues": (
+            VenueForm,
+            Venue,
+            venue_genres,
+            ("name", "city", "state", "address", "phone", "genres",
+             "image_link", "facebook_link"),
+        ),
+        "artists": (
+            ArtistForm,
+            Artist,
+            artist_genres,
+            ("name", "city", "state", "phone", "genres", "image_link",
+             "facebook_link"),
+        ),
+        "shows": (
+            ShowForm,
+            Show,
+            None,
+            ("artist_id", "venue_id", "start_time"),
+        ),
+    }
+
+    def __init__(self, kind, batch_size=500, rejects=None, progress=None):
+        self.form_class, self.model, self.genre_table, self.columns = (
+            self.KINDS[kind]
+        )
+        self.kind = kind
+        self.batch_size = batch_size
+        self.rejects = rejects
+        self.progress = progress
+        self.loaded = 0
+        self.rejected = 0
+        self.batches = 0
+        self.started = None
+        self.genre_ids = {}
+        # name -> id of the artists and venues shows were resolved against
+        self.known = {Artist: {}, Venue: {}}
+
+    @property
+    def rows_per_second(self):
+        elapsed = time.perf_counter() - self.started
+        return (self.loaded + self.rejected) / elapsed if elapsed else 0.0
+
+    def run(self, records):
+        self.started = time.perf_counter()
+        batch = []
+        for line, record in enumerate(records, 1):
+            row = self.validate(line, record)
+            if row is not None:
+                batch.append(row)
+            if len(batch) >= self.batch_size:
+                self.flush(batch)
+                batch = []
+        if batch:
+            self.flush(batch)
+        return self
+
+    def reject(self, line, record, errors):
+        self.rejected += 1
+        if self.rejects is not None:
+            self.rejects.write(
+                json.dumps({"line": line, "record": record, "errors": errors})
+                + "\n"
+            )
+
+    def validate(self, line, record):
+        """The row to insert for a record, or None when it was rejected."""
+        form = self.form_class(
+            formdata=form_data(record), meta={"csrf": False}
+        )
+        if not form.validate():
+            self.reject(line, record, form.errors)
+            return None
+
+        row = {column: form.data.get(column) for column in self.columns}
+        row["_line"] = line
+        row["_record"] = record
+        if self.genre_table is not None:
+            # the CSV copy the search index reads, as set_genres() writes it
+            row["genres"] = ",".join(form.genres.data)
+            row["_genres"] = form.genres.data
+        else:
+            row["artist_name"] = record.get("artist_name")
+            row["venue_name"] = record.get("venue_name")
+        return row
+
+    def flush(self, batch):
+        self.batches += 1
+        if self.kind == "shows":
+            batch = self.resolve_references(batch)
+        if batch:
+            try:
+                self.write(batch)
+                db.session.commit()
+                self.loaded += len(batch)
+            except Exception:
+                db.session.rollback()
+                self.genre_ids = {}
+                for row in batch:
+                    self.write_one(row)
+
+        if self.progress is not None:
+            self.progress(self)
+
+    def write_one(self, row):
+        try:
+            self.write([row])
+            db.session.commit()
+            self.loaded += 1
+        except Exception as e:
+            db.session.rollback()
+            self.genre_ids = {}
+            self.reject(row["_line"], row["_record"], {"database": str(e)})
+
+    def write(self, batch):
+        rows = [
+            {column: row[column] for column in self.columns} for row in batch
+        ]
+        insert_rows(self.model.__table__, rows)
+        if self.genre_table is not None:
+            self.write_genres(batch)
+
+    def write_genres(self, batch):
+        names = {name for row in batch for name in row["_genres"]}
+        missing = [name for name in names if name not in self.genre_ids]
+        if missing:
+            genres = genres_by_name(missing)
+            db.session.flush()
+            self.genre_ids.update((genre.name, genre.id) for genre in genres)
+
+        # names are unique, so they identify the rows just inserted
+        ids = dict(
+            db.session.query(self.model.name, self.model.id).filter(
+                self.model.name.in_([row["name"] for row in batch])
+            )
+        )
+        owner_column = "{}_id".format(self.model.__tablename__.lower())
+        links = [
+            {owner_column: ids[row["name"]], "genre_id": self.genre_ids[name]}
+            for row in batch
+            for name in set(row["_genres"])
+        ]
+        if links:
+            insert_rows(self.genre_table, links)
+
+    def resolve_references(self, batch):
+        """Shows of batch with their artist and venue ids filled in.
+
+        Shows naming or pointing at an artist or venue that does not
+        exist are rejected.
+        """
+        for model, prefix in ((Artist, "artist"), (Venue, "venue")):
+            known = self.known[model]
+            id_key = prefix + "_id"
+            name_key = prefix + "_name"
+
+            names = {
+                row[name_key] for row in batch
+                if not row[id_key] and row[name_key]
+                and row[name_key] not in known
+            }
+            if names:
+                known.update(
+                    db.session.query(model.name, model.id).filter(
+                        model.name.in_(names)
+                    )
+                )
+            ids = {
+                int(row[id_key]) for row in batch
+                if row[id_key] and str(row[id_key]).isdigit()
+            }
+            existing = set()
+            if ids:
+                existing = {
+                    row.id
+                    for row in db.session.query(model.id).filter(
+                        model.id.in_(ids)
+                    )
+                }
+
+            resolved = []
+            for row in batch:
+                if not row[id_key]:
+                    row[id_key] = known.get(row[name_key])
+                elif str(row[id_key]).isdigit():
+                    row[id_key] = int(row[id_key])
+                    if row[id_key] not in existing:
+                        row[id_key] = None
+                else:
+                    row[id_key] = None
+
+                if row[id_key] is None:
+                    self.reject(
+                        row["_line"],
+                        row["_record"],
+                        {id_key: ["Unknown {}".format(prefix)]},
+                    )
+                else:
+                    resolved.append(row)
+            batch = resolved
+        return batch
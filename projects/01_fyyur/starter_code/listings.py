@@ -0,0 +1,278 @@
+from datetime import datetime
+
+import dateutil.parser
+from sqlalchemy import and_, case, func, or_
+
+from models import db, Venue, Artist, Show, Genre
+
+
+def upcoming_show_counts(now):
+    """Subquery of (venue_id, num_upcoming_shows) for shows at or after now."""
+    return (
+        db.session.query(
+            Show.venue_id.label("venue_id"),
+            func.count(Show.id).label("num_upcoming_shows"),
+        )
+        .filter(Show.start_time >= now)
+        .group_by(Show.venue_id)
+        .subquery()
+    )
+
+
+def location_filters(query, model, genre=None, city=None, state=None):
+    """Narrow query to venues or artists of a genre, city and/or state.
+
+    The genre test is an EXISTS over the genre association table, served
+    by its (genre_id, <entity>_id) index rather than a string scan.
+    """
+    if genre:
+        query = query.filter(model.genre_list.any(Genre.name == genre))
+    if city:
+        query = query.filter(model.city == city)
+    if state:
+        query = query.filter(model.state == state)
+    return query
+
+
+def venue_areas(now=None, genre=None, city=None, state=None):
+    """Venues grouped by (city, state) with their upcoming show counts.
+
+    One grouped query does the counting in the database, and a dict keyed
+    by (city, state) finds the area bucket for every venue in O(1).
+    """
+    if now is None:
+        now = datetime.now()
+
+    upcoming = upcoming_show_counts(now)
+    query = db.session.query(
+        Venue.id,
+        Venue.name,
+        Venue.city,
+        Venue.state,
+        func.coalesce(upcoming.c.num_upcoming_shows, 0),
+    ).outerjoin(upcoming, upcoming.c.venue_id == Venue.id)
+    query = location_filters(query, Venue, genre, city, state)
+    rows = query.order_by(Venue.id).all()
+
+    data = []
+    areas = {}
+    for venue_id, name, city, state, num_upcoming_shows in rows:
+        area = areas.get((city, state))
+        if area is None:
+            area = {"city": city, "state": state, "venues": []}
+            areas[(city, state)] = area
+            data.append(area)
+
+        area["venues"].append(
+            {
+                "id": venue_id,
+                "name": name,
+                "num_upcoming_shows": num_upcoming_shows,
+            }
+        )
+
+    return data
+
+
+def artist_list(genre=None, city=None, state=None):
+    """(id, name) of every artist matching the optional filters."""
+    query = db.session.query(Artist.id, Artist.name)
+    query = location_filters(query, Artist, genre, city, state)
+    return query.order_by(Artist.id).all()
+
+
+def artist_ids_for_venue(venue_id):
+    """Ids of the artists with a show at the venue."""
+    rows = (
+        db.session.query(Show.artist_id)
+        .filter(Show.venue_id == venue_id)
+        .distinct()
+    )
+    return [row.artist_id for row in rows]
+
+
+def venue_ids_for_artist(artist_id):
+    """Ids of the venues the artist has a show at."""
+    rows = (
+        db.session.query(Show.venue_id)
+        .filter(Show.artist_id == artist_id)
+        .distinct()
+    )
+    return [row.venue_id for row in rows]
+
+
+def model_dict(instance):
+    """Plain dict of the mapped columns of instance."""
+    return {
+        column.name: getattr(instance, column.name)
+        for column in instance.__table__.columns
+    }
+
+
+def show_timeline(columns, join_model, join_on, show_filter, now,
+                  past_page=1, past_per_page=None):
+    """Past and upcoming shows with their counterpart columns.
+
+    columns are the labelled columns each show row is projected to, and
+    join_model/join_on bring in the artist or venue they come from. The
+    split happens in SQL against a single captured now, so no show or
+    counterpart is ever lazy loaded. When past_per_page is given only
+    that page of the past shows (newest first) is returned.
+    """
+    upcoming_count, past_count = (
+        db.session.query(
+            func.count(case([(Show.start_time > now, Show.id)])),
+            func.count(case([(Show.start_time <= now, Show.id)])),
+        )
+        .filter(show_filter)
+        .one()
+    )
+
+    shows = (
+        db.session.query(*columns)
+        .select_from(Show)
+        .join(join_model, join_on)
+        .filter(show_filter)
+    )
+    upcoming_shows = (
+        shows.filter(Show.start_time > now).order_by(Show.start_time).all()
+    )
+    past_shows = shows.filter(Show.start_time <= now).order_by(
+        Show.start_time.desc()
+    )
+    if past_per_page:
+        past_shows = past_shows.limit(past_per_page).offset(
+            (past_page - 1) * past_per_page
+        )
+    past_shows = past_shows.all()
+
+    timeline = {
+        "past_shows": [row._asdict() for row in past_shows],
+        "upcoming_shows": [row._asdict() for row in upcoming_shows],
+        "past_shows_count": past_count or 0,
+        "upcoming_shows_count": upcoming_count or 0,
+        "past_page": past_page,
+        "past_has_next": False,
+    }
+    if past_per_page:
+        timeline["past_has_next"] = past_page * past_per_page < past_count
+    return timeline
+
+
+def venue_detail(venue_id, past_page=1, past_per_page=None, now=None):
+    """Venue page data, or None when the venue does not exist."""
+    venue = Venue.query.get(venue_id)
+    if not venue:
+        return None
+    if now is None:
+        now = datetime.now()
+
+    data = model_dict(venue)
+    data["genres"] = [genre.name for genre in venue.genre_list]
+    data.update(
+        show_timeline(
+            [
+                Show.artist_id.label("artist_id"),
+                Artist.name.label("artist_name"),
+                Artist.image_link.label("artist_image_link"),
+                Show.start_time.label("start_time"),
+            ],
+            Artist,
+            Show.artist_id == Artist.id,
+            Show.venue_id == venue_id,
+            now,
+            past_page,
+            past_per_page,
+        )
+    )
+    return data
+
+
+def artist_detail(artist_id, past_page=1, past_per_page=None, now=None):
+    """Artist page data, or None when the artist does not exist."""
+    artist = Artist.query.get(artist_id)
+    if not artist:
+        return None
+    if now is None:
+        now = datetime.now()
+
+    data = model_dict(artist)
+    data["genres"] = [genre.name for genre in artist.genre_list]
+    data.update(
+        show_timeline(
+            [
+                Show.venue_id.label("venue_id"),
+                Venue.name.label("venue_name"),
+                Venue.image_link.label("venue_image_link"),
+                Show.start_time.label("start_time"),
+            ],
+            Venue,
+            Show.venue_id == Venue.id,
+            Show.artist_id == artist_id,
+            now,
+            past_page,
+            past_per_page,
+        )
+    )
+    return data
+
+
+def encode_show_cursor(start_time, show_id):
+    """Opaque keyset cursor pointing just past the show (start_time, id)."""
+    return "{}_{}".format(start_time.isoformat(), show_id)
+
+
+def decode_show_cursor(cursor):
+    """(start_time, id) of a cursor, raising ValueError when malformed."""
+    start_time, _, show_id = cursor.rpartition("_")
+    return dateutil.parser.isoparse(start_time), int(show_id)
+
+
+def shows_feed(limit, after=None, upcoming_only=False, start=None, end=None,
+               now=None):
+    """One page of shows ordered by (start_time, id) and the next cursor.
+
+    Pages are addressed with a keyset cursor instead of an offset, so
+    every page costs the same no matter how deep into the history it is.
+    Only the columns the shows page renders are selected.
+    """
+    query = (
+        db.session.query(
+            Show.id.label("id"),
+            Show.venue_id.label("venue_id"),
+            Venue.name.label("venue_name"),
+            Show.artist_id.label("artist_id"),
+            Artist.name.label("artist_name"),
+            Artist.image_link.label("artist_image_link"),
+            Show.start_time.label("start_time"),
+        )
+        .select_from(Show)
+        .join(Venue, Show.venue_id == Venue.id)
+        .join(Artist, Show.artist_id == Artist.id)
+    )
+
+    if upcoming_only:
+        query = query.filter(
+            Show.start_time >= (now if now is not None else datetime.now())
+        )
+    if start is not None:
+        query = query.filter(Show.start_time >= start)
+    if end is not None:
+        query = query.filter(Show.start_time < end)
+    if after is not None:
+        after_time, after_id = decode_show_cursor(after)
+        query = query.filter(
+            or_(
+                Show.start_time > after_time,
+                and_(Show.start_time == after_time, Show.id > after_id),
+            )
+        )
+
+    rows = query.order_by(Show.start_time, Show.id).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_show_cursor(rows[-1].start_time, rows[-1].id)
+
+    return [row._asdict() for row in rows], next_cursor
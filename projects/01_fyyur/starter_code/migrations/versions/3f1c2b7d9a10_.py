@@ -0,0 +1,39 @@
+"""trigram search indexes for venues and artists
+
+Revision ID: 3f1c2b7d9a10
+Revises: ecc59372cda9
+Create Date: 2020-08-10 18:02:41.519307
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "3f1c2b7d9a10"
+down_revision = "ecc59372cda9"
+branch_labels = None
+depends_on = None
+
+# must stay in sync with search.search_text()
+SEARCH_TEXT = "(name || ' ' || city || ' ' || state || ' ' || genres)"
+
+
+def upgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for table in ("Venue", "Artist"):
+        op.execute(
+            'CREATE INDEX "ix_{0}_search_trgm" ON "{0}" '
+            "USING gin ({1} gin_trgm_ops)".format(table, SEARCH_TEXT)
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    for table in ("Venue", "Artist"):
+        op.execute('DROP INDEX IF EXISTS "ix_{}_search_trgm"'.format(table))
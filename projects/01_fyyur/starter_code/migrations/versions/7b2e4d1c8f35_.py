@@ -0,0 +1,89 @@
+"""normalized genre tables
+
+Revision ID: 7b2e4d1c8f35
+Revises: 3f1c2b7d9a10
+Create Date: 2020-08-12 10:41:07.208815
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "7b2e4d1c8f35"
+down_revision = "3f1c2b7d9a10"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    genre = op.create_table(
+        "genre",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(length=120), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("name"),
+    )
+    links = {}
+    for owner in ("venue", "artist"):
+        table = "{}_genres".format(owner)
+        owner_id = "{}_id".format(owner)
+        links[owner] = op.create_table(
+            table,
+            sa.Column(owner_id, sa.Integer(), nullable=False),
+            sa.Column("genre_id", sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint([owner_id], [owner.capitalize() + ".id"],),
+            sa.ForeignKeyConstraint(["genre_id"], ["genre.id"],),
+            sa.PrimaryKeyConstraint(owner_id, "genre_id"),
+        )
+        op.create_index(
+            "ix_{}_genre_id_{}".format(table, owner_id),
+            table,
+            ["genre_id", owner_id],
+        )
+
+    # move the comma separated genres over to the new tables
+    connection = op.get_bind()
+    rows = {}
+    for owner in ("venue", "artist"):
+        rows[owner] = connection.execute(
+            sa.text('SELECT id, genres FROM "{}"'.format(owner.capitalize()))
+        ).fetchall()
+
+    names = sorted(
+        {
+            name.strip()
+            for owner_rows in rows.values()
+            for _, genres in owner_rows
+            for name in (genres or "").split(",")
+            if name.strip()
+        }
+    )
+    if names:
+        op.bulk_insert(genre, [{"name": name} for name in names])
+    genre_ids = dict(
+        (name, genre_id)
+        for genre_id, name in connection.execute(
+            sa.text("SELECT id, name FROM genre")
+        )
+    )
+
+    for owner, owner_rows in rows.items():
+        link_rows = [
+            {"{}_id".format(owner): owner_id, "genre_id": genre_ids[name]}
+            for owner_id, genres in owner_rows
+            for name in {
+                name.strip() for name in (genres or "").split(",")
+                if name.strip()
+            }
+        ]
+        if link_rows:
+            op.bulk_insert(links[owner], link_rows)
+
+
+def downgrade():
+    op.drop_index("ix_artist_genres_genre_id_artist_id", "artist_genres")
+    op.drop_table("artist_genres")
+    op.drop_index("ix_venue_genres_genre_id_venue_id", "venue_genres")
+    op.drop_table("venue_genres")
+    op.drop_table("genre")
@@ -0,0 +1,32 @@
+"""show table indexes
+
+Revision ID: 9c4a8e2f1b67
+Revises: 7b2e4d1c8f35
+Create Date: 2020-08-13 09:15:52.664120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "9c4a8e2f1b67"
+down_revision = "7b2e4d1c8f35"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_show_venue_id_start_time", "show", ["venue_id", "start_time"]
+    )
+    op.create_index(
+        "ix_show_artist_id_start_time", "show", ["artist_id", "start_time"]
+    )
+    op.create_index("ix_show_start_time_id", "show", ["start_time", "id"])
+
+
+def downgrade():
+    op.drop_index("ix_show_start_time_id", "show")
+    op.drop_index("ix_show_artist_id_start_time", "show")
+    op.drop_index("ix_show_venue_id_start_time", "show")
@@ -20,6 +20,46 @@ class Show(db.Model):
     venue_id = db.Column(db.Integer, db.ForeignKey("Venue.id"))
     start_time = db.Column(db.DateTime, default=datetime.datetime.utcnow)
 
+    __table_args__ = (
+        # a venue's / an artist's shows split into past and upcoming
+        db.Index("ix_show_venue_id_start_time", "venue_id", "start_time"),
+        db.Index("ix_show_artist_id_start_time", "artist_id", "start_time"),
+        # the /shows feed and upcoming show counts
+        db.Index("ix_show_start_time_id", "start_time", "id"),
+    )
+
+
+# Normalized genres. The genres CSV column on Venue and Artist is kept as a
+# copy for the search index; set_genres() keeps both in step.
+venue_genres = db.Table(
+    "venue_genres",
+    db.Column(
+        "venue_id", db.Integer, db.ForeignKey("Venue.id"), primary_key=True
+    ),
+    db.Column(
+        "genre_id", db.Integer, db.ForeignKey("genre.id"), primary_key=True
+    ),
+    db.Index("ix_venue_genres_genre_id_venue_id", "genre_id", "venue_id"),
+)
+
+artist_genres = db.Table(
+    "artist_genres",
+    db.Column(
+        "artist_id", db.Integer, db.ForeignKey("Artist.id"), primary_key=True
+    ),
+    db.Column(
+        "genre_id", db.Integer, db.ForeignKey("genre.id"), primary_key=True
+    ),
+    db.Index("ix_artist_genres_genre_id_artist_id", "genre_id", "artist_id"),
+)
+
+
+class Genre(db.Model):
+    __tablename__ = "genre"
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+
 
 class Venue(db.Model):
     __tablename__ = "Venue"
@@ -37,6 +77,9 @@ class Venue(db.Model):
     seeking_talent = db.Column(db.Boolean, default=False)
     seeking_description = db.Column(db.String(1000))
     shows = db.relationship(Show, backref="venue", lazy=True)
+    genre_list = db.relationship(
+        Genre, secondary=venue_genres, order_by=Genre.name, lazy=True
+    )
 
 
 class Artist(db.Model):
@@ -54,3 +97,28 @@ class Artist(db.Model):
     seeking_venue = db.Column(db.Boolean, default=False)
     seeking_description = db.Column(db.String(1000))
     shows = db.relationship(Show, backref="artist", lazy=True)
+    genre_list = db.relationship(
+        Genre, secondary=artist_genres, order_by=Genre.name, lazy=True
+    )
+
+
+def genres_by_name(names):
+    """Genre rows for names, creating the ones that do not exist yet."""
+    names = list(dict.fromkeys(name for name in names if name))
+    if not names:
+        return []
+    found = {
+        genre.name: genre
+        for genre in Genre.query.filter(Genre.name.in_(names)).all()
+    }
+    for name in names:
+        if name not in found:
+            found[name] = Genre(name=name)
+            db.session.add(found[name])
+    return [found[name] for name in names]
+
+
+def set_genres(entity, names):
+    """Store names as the genres of a venue or artist."""
+    entity.genres = ",".join(names)
+    entity.genre_list = genres_by_name(names)
@@ -0,0 +1,220 @@
+"""Ranked, paginated search over venues and artists.
+
+Searches match the term anywhere in the name, city, state or genres.
+On PostgreSQL the pg_trgm GIN indexes from migration 3f1c2b7d9a10 turn
+the ILIKE into an index scan. Other databases, such as the SQLite files
+used for test runs, fall back to an in-process trigram index.
+"""
+import threading
+
+from sqlalchemy import case, event, func, literal_column
+from sqlalchemy.orm import Session, object_session
+
+from models import db, Venue, Artist, Genre
+
+
+def search_text(model):
+    """The expression the search indexes are built on."""
+    space = literal_column("' '")
+    return (
+        model.name + space + model.city + space + model.state + space
+        + model.genres
+    )
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def rank(name, term):
+    """Sort key putting prefix matches on the name first, then name hits."""
+    name = name.lower()
+    if name.startswith(term):
+        position = 0
+    elif term in name:
+        position = 1
+    else:
+        position = 2
+    return position, name
+
+
+class TrigramIndex:
+    """In-process trigram index over the search text of one model.
+
+    A term of three or more characters only has to be checked against
+    the documents holding all of its trigrams. The index is built on the
+    first search and kept current by the model's mapper events. Those
+    fire at flush, so the changes are staged on the session and only
+    applied once it commits; a rollback drops them.
+
+    The index is shared by every thread of the process, so building,
+    searching and applying a commit all hold its lock.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.lock = threading.RLock()
+        self.documents = None
+        self.postings = {}
+        for name in ("after_insert", "after_update"):
+            event.listen(model, name, self._on_write)
+        event.listen(model, "after_delete", self._on_delete)
+        event.listen(Session, "after_commit", self._on_commit)
+        event.listen(
+            Session, "after_transaction_end", self._on_transaction_end
+        )
+
+    def reset(self):
+        with self.lock:
+            self.documents = None
+            self.postings = {}
+
+    def build(self):
+        with self.lock:
+            self.reset()
+            self.documents = {}
+            rows = db.session.query(
+                self.model.id, self.model.name, search_text(self.model)
+            ).all()
+            for doc_id, name, text in rows:
+                self.add(doc_id, name, text)
+
+    def add(self, doc_id, name, text):
+        with self.lock:
+            self.remove(doc_id)
+            text = (text or "").lower()
+            self.documents[doc_id] = (name, text)
+            for trigram in trigrams(text):
+                self.postings.setdefault(trigram, set()).add(doc_id)
+
+    def remove(self, doc_id):
+        with self.lock:
+            document = self.documents.pop(doc_id, None)
+            if document is None:
+                return
+            for trigram in trigrams(document[1]):
+                self.postings[trigram].discard(doc_id)
+
+    def search(self, term):
+        """Ids of the documents containing term, best match first."""
+        term = term.lower()
+        keys = trigrams(term)
+        with self.lock:
+            if self.documents is None:
+                self.build()
+
+            if keys:
+                candidates = set.intersection(
+                    *(self.postings.get(key, set()) for key in keys)
+                )
+            else:
+                candidates = self.documents.keys()
+
+            matches = [
+                (rank(self.documents[doc_id][0], term), doc_id)
+                for doc_id in candidates
+                if term in self.documents[doc_id][1]
+            ]
+        matches.sort()
+        return [doc_id for key, doc_id in matches]
+
+    def _staged(self, target):
+        """Changes flushed by target's session: id -> document or None."""
+        return object_session(target).info.setdefault(self, {})
+
+    def _on_write(self, mapper, connection, target):
+        fields = (target.name, target.city, target.state, target.genres)
+        self._staged(target)[target.id] = (target.name, " ".join(fields))
+
+    def _on_delete(self, mapper, connection, target):
+        self._staged(target)[target.id] = None
+
+    def _on_commit(self, session):
+        if session.transaction is not None and session.transaction.nested:
+            return
+        staged = session.info.pop(self, None)
+        if not staged:
+            return
+        with self.lock:
+            if self.documents is None:
+                return
+            for doc_id, document in staged.items():
+                if document is None:
+                    self.remove(doc_id)
+                else:
+                    self.add(doc_id, *document)
+
+    def _on_transaction_end(self, session, transaction):
+        # whatever was not committed was rolled back or abandoned
+        if transaction.parent is None:
+            session.info.pop(self, None)
+
+
+indexes = {Venue: TrigramIndex(Venue), Artist: TrigramIndex(Artist)}
+
+
+def escape_like(term):
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search(model, term, page=1, per_page=20, genre=None):
+    """Total number of matches and the requested page of them.
+
+    Every result is a dict with the id, name, city and state of the
+    venue or artist. genre restricts the results to one genre.
+    """
+    columns = (model.id, model.name, model.city, model.state)
+    offset = (page - 1) * per_page
+    genre_filter = model.genre_list.any(Genre.name == genre)
+
+    if db.engine.dialect.name == "postgresql":
+        escaped = escape_like(term)
+        query = db.session.query(*columns).filter(
+            search_text(model).ilike("%" + escaped + "%", escape="\\")
+        )
+        if genre:
+            query = query.filter(genre_filter)
+        total = query.count()
+        rows = (
+            query.order_by(
+                case(
+                    [
+                        (model.name.ilike(escaped + "%", escape="\\"), 0),
+                        (
+                            model.name.ilike(
+                                "%" + escaped + "%", escape="\\"
+                            ),
+                            1,
+                        ),
+                    ],
+                    else_=2,
+                ),
+                func.similarity(model.name, term).desc(),
+                model.name,
+                model.id,
+            )
+            .limit(per_page)
+            .offset(offset)
+            .all()
+        )
+    else:
+        ids = indexes[model].search(term)
+        if genre:
+            allowed = {
+                row.id
+                for row in db.session.query(model.id).filter(genre_filter)
+            }
+            ids = [doc_id for doc_id in ids if doc_id in allowed]
+        total = len(ids)
+        page_ids = ids[offset:offset + per_page]
+        rows = []
+        if page_ids:
+            found = {
+                row.id: row
+                for row in db.session.query(*columns).filter(
+                    model.id.in_(page_ids)
+                )
+            }
+            rows = [found[doc_id] for doc_id in page_ids if doc_id in found]
+
+    return total, [row._asdict() for row in rows]
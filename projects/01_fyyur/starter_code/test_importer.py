@@ -0,0 +1,102 @@
+"""Tests for the bulk importer, run against a throwaway SQLite database.
+
+    python -m unittest test_importer
+"""
+import json
+import os
+import tempfile
+import unittest
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = "sqlite:///{}".format(
+        os.path.join(tempfile.mkdtemp(), "fyyur_test.db")
+    )
+
+from app import app  # noqa: E402
+from importer import Importer, read_records  # noqa: E402
+from models import db, Venue, Artist  # noqa: E402
+
+VENUES = [
+    {
+        "name": "The Musical Hop",
+        "city": "San Francisco",
+        "state": "CA",
+        "address": "1015 Folsom Street",
+        "phone": "123-123-1234",
+        "genres": ["Jazz", "Reggae"],
+        "facebook_link": "https://www.facebook.com/TheMusicalHop",
+    },
+    {
+        "name": "Park Square Live Music & Coffee",
+        "city": "San Francisco",
+        "state": "CA",
+        "address": "34 Whiskey Moore Ave",
+        "genres": "Rock n Roll,Jazz",
+        "facebook_link": "https://www.facebook.com/ParkSquareLiveMusic",
+    },
+]
+
+ARTISTS = [
+    {
+        "name": "Guns N Petals",
+        "city": "San Francisco",
+        "state": "CA",
+        "phone": "326-123-5000",
+        "genres": ["Rock n Roll"],
+        "facebook_link": "https://www.facebook.com/GunsNPetals",
+    },
+    {
+        "name": "Matt Quevedo",
+        "city": "New York",
+        "state": "NY",
+        "genres": "Jazz",
+        "facebook_link": "https://www.facebook.com/mattquevedo",
+    },
+]
+
+
+class ImporterTestCase(unittest.TestCase):
+    def setUp(self):
+        self.context = app.test_request_context()
+        self.context.push()
+        db.drop_all()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        self.context.pop()
+
+    def write_jsonl(self, records):
+        f = tempfile.NamedTemporaryFile(
+            "w", suffix=".jsonl", delete=False
+        )
+        with f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+        self.addCleanup(os.remove, f.name)
+        return f.name
+
+    def assert_imported(self, kind, model, records):
+        importer = Importer(kind).run(read_records(self.write_jsonl(records)))
+
+        self.assertEqual(importer.loaded, len(records))
+        self.assertEqual(importer.rejected, 0)
+        for record in records:
+            entity = model.query.filter_by(name=record["name"]).one()
+            genres = record["genres"]
+            if isinstance(genres, str):
+                genres = genres.split(",")
+            self.assertEqual(entity.genres, ",".join(genres))
+            self.assertCountEqual(
+                [genre.name for genre in entity.genre_list], genres
+            )
+
+    def test_import_venues(self):
+        self.assert_imported("venues", Venue, VENUES)
+
+    def test_import_artists(self):
+        self.assert_imported("artists", Artist, ARTISTS)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,156 @@
+"""Quiz latency benchmarks for the trivia API against a seeded database.
+
+    python bench.py quiz quiz_scan
+    python bench.py quiz --sizes 1000,100000
+
+Every run seeds a fresh SQLite file (or whatever DATABASE_URL points at)
+and reports the average latency of each request for every bank size.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = "sqlite:///{}".format(
+        os.path.join(tempfile.mkdtemp(), "trivia_bench.db")
+    )
+
+from flaskr import create_app  # noqa: E402
+from models import db, Question, Category  # noqa: E402
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+CATEGORIES = ["Science", "Art", "Geography", "History", "Entertainment",
+              "Sports"]
+REPEAT = 20
+
+app = create_app()
+
+
+def seed(num_questions):
+    """Recreate the schema and fill it with num_questions questions."""
+    db.drop_all()
+    db.create_all()
+    db.session.bulk_insert_mappings(
+        Category,
+        [{"id": i, "type": type} for i, type in enumerate(CATEGORIES, 1)],
+    )
+    db.session.bulk_insert_mappings(
+        Question,
+        [
+            {
+                "id": i,
+                "question": "Question {}?".format(i),
+                "answer": "Answer {}".format(i),
+                "category": i % len(CATEGORIES) + 1,
+                "difficulty": i % 5 + 1,
+            }
+            for i in range(1, num_questions + 1)
+        ],
+    )
+    db.session.commit()
+    app.extensions["categories"].invalidate()
+    app.extensions["quiz_questions"].invalidate()
+
+
+def time_quiz(client, category_id, quiz_length, repeat=REPEAT):
+    """Average wall time in milliseconds of POST /quizzes, asked after
+    quiz_length questions of the category were already played."""
+    played = db.session.query(Question.id)
+    if category_id:
+        played = played.filter(Question.category == category_id)
+    played = [question_id for question_id, in played.limit(quiz_length)]
+    body = {
+        "quiz_category": {"id": category_id},
+        "previous_questions": played,
+    }
+    client.post("/quizzes", json=body)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        response = client.post("/quizzes", json=dict(body))
+        assert response.status_code == 200, response.status
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def bench_quiz(client, size):
+    return time_quiz(client, 1, 5)
+
+
+def bench_quiz_long(client, size):
+    return time_quiz(client, 1, 50)
+
+
+def bench_quiz_all(client, size):
+    return time_quiz(client, 0, 50)
+
+
+def bench_quiz_session(client, size):
+    """The next question of a server-side quiz session of 50 questions,
+    asked after 25 were played."""
+    response = client.post(
+        "/quizzes/sessions", json={"quiz_category": {"id": 1}, "length": 50}
+    )
+    token = response.get_json()["quiz_session"]
+    url = "/quizzes/sessions/{}/next".format(token)
+    for _ in range(25):
+        client.post(url)
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        assert client.post(url).status_code == 200
+    return (time.perf_counter() - start) * 1000 / REPEAT
+
+
+def bench_quiz_scan(client, size):
+    """What /quizzes used to do: load the category minus the played ids
+    and pick one of them."""
+    played = [
+        question_id for question_id, in db.session.query(Question.id)
+        .filter(Question.category == 1)
+        .limit(50)
+    ]
+
+    def scan():
+        result = (
+            Question.query.filter(Question.category == 1)
+            .filter(~Question.id.in_(played))
+            .all()
+        )
+        return result[random.randint(0, len(result) - 1)].format()
+
+    scan()
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        scan()
+    return (time.perf_counter() - start) * 1000 / REPEAT
+
+
+BENCHMARKS = {
+    "quiz": bench_quiz,
+    "quiz_long": bench_quiz_long,
+    "quiz_all": bench_quiz_all,
+    "quiz_session": bench_quiz_session,
+    "quiz_scan": bench_quiz_scan,
+}
+
+
+def main(argv):
+    sizes = DEFAULT_SIZES
+    if "--sizes" in argv:
+        index = argv.index("--sizes")
+        sizes = [int(n) for n in argv[index + 1].split(",")]
+        argv = argv[:index] + argv[index + 2:]
+    names = argv or list(BENCHMARKS)
+
+    client = app.test_client()
+    with app.app_context():
+        for size in sizes:
+            seed(size)
+            for name in names:
+                elapsed = BENCHMARKS[name](client, size)
+                print("{:<12} {:>8} rows {:>10.2f} ms".format(
+                    name, size, elapsed))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
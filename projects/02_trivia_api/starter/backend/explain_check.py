@@ -0,0 +1,110 @@
+"""Check that category listings and quiz draws use index scans.
+
+    python explain_check.py
+    DATABASE_URL=postgres://localhost:5432/trivia_check python explain_check.py
+
+Seeds a throwaway database the way bench.py does, captures the SQL the
+/categories/<id>/questions and /quizzes endpoints run, and inspects the
+EXPLAIN output of every statement that reads the questions table. Exits
+with status 1 if any of them falls back to a sequential scan of it.
+"""
+import re
+import sys
+
+from sqlalchemy import event
+
+import bench
+from bench import app
+from models import db
+
+NUM_QUESTIONS = 20000
+
+HOT_REQUESTS = {
+    "category": lambda client: client.get("/categories/1/questions"),
+    "category_page": lambda client: client.get(
+        "/categories/1/questions?page=100"
+    ),
+    "category_after": lambda client: client.get(
+        "/categories/1/questions?after={}".format(NUM_QUESTIONS // 2)
+    ),
+    "quiz": lambda client: client.post(
+        "/quizzes",
+        json={"quiz_category": {"id": 1}, "previous_questions": [1, 7]},
+    ),
+}
+
+READS_QUESTIONS = re.compile(r"\bquestions\b")
+SQLITE_QUESTIONS_SCAN = re.compile(r"^SCAN (TABLE )?questions\b")
+
+
+def capture(func):
+    """Run func and return the (statement, parameters) it executed."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context,
+                              executemany):
+        statements.append((statement, parameters))
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        func()
+    finally:
+        event.remove(
+            db.engine, "before_cursor_execute", before_cursor_execute
+        )
+    return statements
+
+
+def explain(statement, parameters):
+    """Plan lines of statement, run on a raw DBAPI connection."""
+    sqlite = db.engine.dialect.name == "sqlite"
+    prefix = "EXPLAIN QUERY PLAN " if sqlite else "EXPLAIN "
+    connection = db.engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(prefix + statement, parameters)
+        return [row[-1] if sqlite else row[0] for row in cursor.fetchall()]
+    finally:
+        connection.close()
+
+
+def scans_questions(plan):
+    """Whether a plan reads the questions table without an index."""
+    if db.engine.dialect.name == "sqlite":
+        return any(
+            SQLITE_QUESTIONS_SCAN.match(line) and "USING" not in line
+            for line in plan
+        )
+    return any("Seq Scan on questions" in line for line in plan)
+
+
+def main():
+    bench.seed(NUM_QUESTIONS)
+    db.session.execute("ANALYZE")
+    db.session.commit()
+
+    client = app.test_client()
+    failures = 0
+    for name, request in HOT_REQUESTS.items():
+        # the first request loads the category map and the quiz ids,
+        # which read every row on purpose
+        request(client)
+        for statement, parameters in capture(lambda: request(client)):
+            if not READS_QUESTIONS.search(statement):
+                continue
+            plan = explain(statement, parameters)
+            ok = not scans_questions(plan)
+            failures += not ok
+            print("{:<16} {}".format(name, "index" if ok else "SEQ SCAN"))
+            if not ok:
+                print("\n".join("    " + line for line in plan))
+
+    if failures:
+        print("{} statements scan the questions table".format(failures))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    with app.app_context():
+        sys.exit(main())
@@ -1,10 +1,17 @@
 import os
-from flask import Flask, request, abort, jsonify
+import click
+from flask import Flask, Response, request, abort, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
-import random
 
-from models import setup_db, Question, Category, db
+from models import setup_db, Question, db
+from .categories import CategoryRegistry
+from .counts import QuestionCounts
+from .loader import QuestionLoader, read_records
+from .pagination import page_args, paginate
+from .quiz import QuestionPool
+from .search import search
+from .sessions import QuizSessions, store_from_config
 
 QUESTIONS_PER_PAGE = 10
 
@@ -12,16 +19,75 @@ QUESTIONS_PER_PAGE = 10
 def create_app(test_config=None):
     # create and configure the app
     app = Flask(__name__)
+    app.config.from_mapping(
+        # seconds before the category map is read from the database again
+        CATEGORY_CACHE_TTL=int(os.environ.get("CATEGORY_CACHE_TTL", 300)),
+        # seconds before the quiz question ids are read again
+        QUIZ_POOL_TTL=int(os.environ.get("QUIZ_POOL_TTL", 300)),
+        # seconds before the question counts are recounted
+        QUESTION_COUNT_TTL=int(os.environ.get("QUESTION_COUNT_TTL", 60)),
+        # report the size of the whole bank from planner statistics
+        QUESTION_COUNT_APPROXIMATE=(
+            os.environ.get("QUESTION_COUNT_APPROXIMATE", "0") == "1"
+        ),
+        # "memory" or "sqlite:<path>" to share sessions between workers
+        QUIZ_SESSION_STORE=os.environ.get("QUIZ_SESSION_STORE", "memory"),
+        QUIZ_SESSION_TTL=int(os.environ.get("QUIZ_SESSION_TTL", 3600)),
+        # most sessions a "memory" store keeps
+        QUIZ_SESSION_MAX=int(os.environ.get("QUIZ_SESSION_MAX", 10000)),
+        # questions per quiz, unless the client asks for another length
+        QUIZ_SESSION_LENGTH=5,
+        QUIZ_SESSION_MAX_LENGTH=100,
+        # "database", "memory" or "auto" (the database on PostgreSQL)
+        QUESTION_SEARCH=os.environ.get("QUESTION_SEARCH", "auto"),
+        QUESTIONS_PER_PAGE=int(
+            os.environ.get("QUESTIONS_PER_PAGE", QUESTIONS_PER_PAGE)
+        ),
+    )
+    if test_config is not None:
+        app.config.update(test_config)
     setup_db(app)
 
+    categories = CategoryRegistry(ttl=app.config["CATEGORY_CACHE_TTL"])
+    with app.app_context():
+        categories.load()
+    app.extensions["categories"] = categories
+    questions = QuestionPool(ttl=app.config["QUIZ_POOL_TTL"])
+    app.extensions["quiz_questions"] = questions
+    counts = QuestionCounts(
+        ttl=app.config["QUESTION_COUNT_TTL"],
+        approximate=app.config["QUESTION_COUNT_APPROXIMATE"],
+    )
+    app.extensions["question_counts"] = counts
+    quiz_sessions = QuizSessions(
+        questions,
+        store_from_config(
+            app.config["QUIZ_SESSION_STORE"], app.config["QUIZ_SESSION_MAX"]
+        ),
+        ttl=app.config["QUIZ_SESSION_TTL"],
+    )
+    app.extensions["quiz_sessions"] = quiz_sessions
+
     cors = CORS(app, resources={r"/api/*": {"origins": "*"}})
 
-    def paginate_result(request, data):
-        page = request.args.get("page", 1)
-        start = (int(page) - 1) * 10
-        end = start + 10
+    def paginate_questions(query, count=None):
+        page, after = page_args(request.args)
+        return paginate(
+            query, Question.id, page, app.config["QUESTIONS_PER_PAGE"],
+            after=after, count=count,
+        )
 
-        return data[start:end]
+    @app.cli.command("load-questions")
+    @click.argument("path")
+    @click.option("--batch-size", default=1000, show_default=True,
+                  help="Questions written per transaction.")
+    def load_questions(path, batch_size):
+        """Bulk load questions from a JSON Lines or CSV file."""
+        loader = QuestionLoader(
+            categories.types(), batch_size=batch_size, echo=click.echo
+        )
+        loader.load(read_records(path))
+        questions.invalidate()
 
     @app.after_request
     def after_request(response):
@@ -35,50 +101,32 @@ def create_app(test_config=None):
 
     @app.route("/categories", methods=["GET"])
     def get_catagories():
-        categories = Category.query.all()
-        formatted_categories = [category.format() for category in categories]
-        categories = {}
-        for category in formatted_categories:
-            categories[str(category["id"])] = category["type"]
-        return jsonify({"success": True, "categories": categories})
+        return Response(categories.body(), mimetype="application/json")
 
     @app.route("/questions", methods=["GET"])
     def get_questions():
-        result = (
-            db.session.query(Question, Category)
-            .filter(Question.category == Category.id)
-            .all()
+        # the foreign key leaves only questions of existing categories
+        page = paginate_questions(
+            Question.query.filter(Question.category.isnot(None)),
+            count=counts.categorized,
         )
 
-        if not result:
+        if not page.total and not page.items:
             abort(500)
 
-        # format and paginate questions
-        questions = [question for question, _ in result]
-        formatted_questions = [question.format() for question in questions]
-        paginated_questions = paginate_result(request, formatted_questions)
-
-        # get all categories of the questions
-        categories = {category for _, category in result}
-        formatted_categories = [category.format() for category in categories]
-
-        # format them to be dict
-        categories_dict = {}
-        for category in formatted_categories:
-            app.logger.info(category)
-            categories_dict[str(category["id"])] = category["type"]
-
-        if len(categories) == 1:
-            current_category = categories_dict.values()[0]
+        categories_dict = categories.as_json()
+        if len(categories_dict) == 1:
+            current_category = list(categories_dict.values())[0]
         else:
             current_category = list(categories_dict.values())
 
         return jsonify(
             {
                 "success": True,
-                "questions": paginated_questions,
+                "questions": [question.format() for question in page.items],
                 "categories": categories_dict,
-                "total_num_questions": len(questions),
+                "total_num_questions": page.total,
+                "next_cursor": page.next_cursor,
                 "current_category": current_category,
             }
         )
@@ -87,12 +135,15 @@ def create_app(test_config=None):
     def delete_question(question_id):
         try:
             question = Question.query.get(question_id)
+            category = question.category
             question.delete()
         except Exception:
             db.session.rollback()
             abort(404)
         finally:
             db.session.close()
+        questions.invalidate()
+        counts.removed(category)
 
         return jsonify({
             "success": True,
@@ -106,7 +157,9 @@ def create_app(test_config=None):
             question_text = data["question"]
             answer = data["answer"]
             difficulty = data["difficulty"]
-            category = data["category"]
+            category = int(data["category"])
+            if categories.get(category) is None:
+                abort(422)
 
             question = Question(
                 question=question_text,
@@ -120,6 +173,8 @@ def create_app(test_config=None):
             abort(422)
         finally:
             db.session.close()
+        questions.invalidate()
+        counts.added(category)
         return jsonify({
             "success": True,
             "message": "question was successfely added"
@@ -127,45 +182,50 @@ def create_app(test_config=None):
 
     @app.route("/questions/search", methods=["POST"])
     def search_questions():
-        search = request.get_json().get("query", "")
-        look_for = "%{0}%".format(search)
-        result = Question.query.filter(Question.question.ilike(look_for)).all()
+        term = request.get_json().get("query", "")
+        # results are ranked, so they are paged by number only
+        page_number, _ = page_args(request.args)
+        page = search(
+            term,
+            page=page_number,
+            per_page=app.config["QUESTIONS_PER_PAGE"],
+            backend=app.config["QUESTION_SEARCH"],
+        )
 
-        if not result:
+        if not page.total:
             abort(404)
 
-        formatted_questions = [question.format() for question in result]
-        paginated_questions = paginate_result(request, formatted_questions)
-
         return jsonify(
             {
                 "success": True,
-                "questions": paginated_questions,
-                "total_num_questions": len(result),
+                "questions": [question.format() for question in page.items],
+                "total_num_questions": page.total,
+                "next_cursor": page.next_cursor,
             }
         )
 
     @app.route("/categories/<int:category_id>/questions", methods=["GET"])
     def get_question_per_category(category_id):
-        category = Category.query.get(category_id)
+        category_type = categories.get(category_id)
 
-        if not category:
+        if category_type is None:
             abort(500)
 
-        result = Question.query.filter(Question.category == category_id).all()
+        page = paginate_questions(
+            Question.query.filter(Question.category == category_id),
+            count=lambda: counts.category(category_id),
+        )
 
-        if not result:
+        if not page.total and not page.items:
             abort(500)
 
-        formatted_questions = [question.format() for question in result]
-        paginated_questions = paginate_result(request, formatted_questions)
-
         return jsonify(
             {
                 "success": True,
-                "questions": paginated_questions,
-                "total_num_questions": len(result),
-                "category": category.type,
+                "questions": [question.format() for question in page.items],
+                "total_num_questions": page.total,
+                "next_cursor": page.next_cursor,
+                "category": category_type,
             }
         )
 
@@ -173,26 +233,30 @@ def create_app(test_config=None):
     def quiz_questions():
         data = request.get_json()
         quiz_category = data.get("quiz_category", {"id": 1})
-        category_id = quiz_category["id"]
         previous_questions = data.get("previous_questions", [])
+        try:
+            # the frontend sends the id as a string
+            category_id = int(quiz_category["id"])
+            seen = set(previous_questions)
+        except (KeyError, TypeError, ValueError):
+            abort(422)
 
-        if category_id == 0:
-            result = Question.query.all()
-        else:
-            result = (
-                Question.query.filter(Question.category == category_id)
-                .filter(~Question.id.in_(previous_questions))
-                .all()
-            )
-
-        if not result:
-            return jsonify({
-                "success": True,
-                "previous_questions": previous_questions
-            })
+        # category 0 draws from every category
+        while True:
+            question_id = questions.draw(category_id, seen)
+            if question_id is None:
+                return jsonify({
+                    "success": True,
+                    "previous_questions": previous_questions
+                })
+            question = Question.query.get(question_id)
+            if question is not None:
+                break
+            # deleted by another worker since the ids were loaded
+            seen.add(question_id)
+            questions.invalidate()
 
-        random_id = random.randint(0, len(result) - 1)
-        formatted_question = result[random_id].format()
+        formatted_question = question.format()
         previous_questions.append(formatted_question['id'])
 
         return jsonify({
@@ -201,6 +265,64 @@ def create_app(test_config=None):
             "previous_questions": previous_questions
         })
 
+    @app.route("/quizzes/sessions", methods=["POST"])
+    def start_quiz_session():
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data, dict):
+            abort(422)
+        quiz_category = data.get("quiz_category", {"id": 0})
+        if not isinstance(quiz_category, dict):
+            abort(422)
+        try:
+            category_id = int(quiz_category["id"])
+            length = int(
+                data.get("length", app.config["QUIZ_SESSION_LENGTH"])
+            )
+        except (KeyError, TypeError, ValueError):
+            abort(422)
+        if not 0 < length <= app.config["QUIZ_SESSION_MAX_LENGTH"]:
+            abort(422)
+        # category 0 draws from every category
+        if category_id != 0 and categories.get(category_id) is None:
+            abort(422)
+
+        token, session = quiz_sessions.start(category_id, length)
+
+        return jsonify({
+            "success": True,
+            "quiz_session": token,
+            "remaining": session.remaining()
+        })
+
+    @app.route("/quizzes/sessions/<token>/next", methods=["POST"])
+    def next_quiz_question(token):
+        question = None
+        while question is None:
+            stepped = quiz_sessions.next_id(token)
+            if stepped is None:
+                abort(404)
+            question_id, session = stepped
+            if question_id is None:
+                break
+            # None if it was deleted since the quiz started
+            question = Question.query.get(question_id)
+
+        result = {
+            "success": True,
+            "quiz_session": token,
+            "remaining": session.remaining()
+        }
+        if question is not None:
+            result["question"] = question.format()
+        return jsonify(result)
+
+    @app.errorhandler(400)
+    def bad_request(error):
+        return jsonify({
+            "success": False,
+            "error": 400, "message": "Bad Request"
+        }), 400
+
     @app.errorhandler(404)
     def not_found(error):
         return jsonify({
@@ -0,0 +1,79 @@
+import json
+import threading
+import time
+
+from models import Category
+
+"""
+CategoryRegistry
+    the process-wide id -> type map of the trivia categories, shared by
+    every endpoint that reports categories
+
+    the map and the serialized GET /categories body are loaded once and
+    reloaded when they are older than ttl seconds, or on the next use
+    after invalidate() was called by code that changed a category
+"""
+
+
+class CategoryRegistry:
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self.version = 0
+        self.lock = threading.Lock()
+        self.loaded = None
+
+    """
+    load()
+        reads the categories table and serializes the /categories body
+        must run inside an application context
+    """
+
+    def load(self):
+        version = self.version
+        types = {
+            category.id: category.type
+            for category in Category.query.order_by(Category.id)
+        }
+        body = json.dumps({
+            "success": True,
+            "categories": {str(id): type for id, type in types.items()},
+        }).encode("utf-8")
+        with self.lock:
+            self.loaded = (version, time.monotonic(), types, body)
+        return self.loaded
+
+    def invalidate(self):
+        with self.lock:
+            self.version += 1
+
+    def current(self):
+        loaded = self.loaded
+        if (
+            loaded is None
+            or loaded[0] != self.version
+            or time.monotonic() - loaded[1] >= self.ttl
+        ):
+            loaded = self.load()
+        return loaded
+
+    """
+    types()
+        the {id: type} map of every category
+    """
+
+    def types(self):
+        return self.current()[2]
+
+    """
+    body()
+        the serialized {"success": True, "categories": {...}} response
+    """
+
+    def body(self):
+        return self.current()[3]
+
+    def get(self, category_id):
+        return self.types().get(category_id)
+
+    def as_json(self):
+        return {str(id): type for id, type in self.types().items()}
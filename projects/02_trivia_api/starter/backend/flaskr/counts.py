@@ -0,0 +1,104 @@
+import threading
+import time
+
+from sqlalchemy import func
+
+from models import db, Question
+
+"""
+QuestionCounts
+    the number of questions in each category, so listing endpoints
+    report totals without counting rows on every request
+
+    the counts are read with one GROUP BY over the (category, id)
+    index, kept up to date by added() and removed() as the API changes
+    questions, and read again when they are older than ttl seconds to
+    pick up changes made by other workers or the bulk loader
+
+    with approximate=True the number of questions of the whole bank
+    comes from the planner statistics on PostgreSQL (pg_class.reltuples,
+    kept current by autovacuum) instead of counting it
+"""
+
+
+class QuestionCounts:
+    def __init__(self, ttl=60, approximate=False):
+        self.ttl = ttl
+        self.approximate = approximate
+        self.lock = threading.Lock()
+        self.counts = None
+        self.loaded_at = None
+
+    """
+    load()
+        counts the questions of every category
+        must run inside an application context
+    """
+
+    def load(self):
+        counts = dict(
+            db.session.query(Question.category, func.count(Question.id))
+            .group_by(Question.category)
+        )
+        with self.lock:
+            self.counts = counts
+            self.loaded_at = time.monotonic()
+        return counts
+
+    def current(self):
+        counts = self.counts
+        if counts is None or time.monotonic() - self.loaded_at >= self.ttl:
+            counts = self.load()
+        return counts
+
+    def added(self, category_id):
+        with self.lock:
+            if self.counts is not None:
+                self.counts[category_id] = self.counts.get(category_id, 0) + 1
+
+    def removed(self, category_id):
+        with self.lock:
+            if self.counts is not None and self.counts.get(category_id):
+                self.counts[category_id] -= 1
+
+    def invalidate(self):
+        with self.lock:
+            self.counts = None
+
+    """
+    category(category_id)
+        the number of questions in a category
+    """
+
+    def category(self, category_id):
+        return self.current().get(category_id, 0)
+
+    """
+    categorized()
+        the number of questions that belong to a category
+    """
+
+    def categorized(self):
+        if self.approximate:
+            estimate = self.estimate()
+            if estimate is not None:
+                return estimate
+        counts = self.current()
+        return sum(n for category, n in counts.items() if category is not None)
+
+    """
+    estimate()
+        the planner's row estimate of the questions table, or None where
+        there is none (not PostgreSQL, or never analyzed)
+    """
+
+    def estimate(self):
+        if db.engine.dialect.name != "postgresql":
+            return None
+        rows = db.session.execute(
+            "SELECT reltuples::bigint FROM pg_class "
+            "WHERE oid = 'public.questions'::regclass"
+        ).scalar()
+        if rows is None or rows < 0:
+            return None
+        return rows
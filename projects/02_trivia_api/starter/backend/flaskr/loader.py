@@ -0,0 +1,172 @@
+import csv
+import json
+import time
+
+from models import db, Question
+
+DIFFICULTIES = range(1, 6)
+
+"""
+read_records(path)
+    yields (line number, record dict) for every question in a JSON Lines
+    (.jsonl / .json) or CSV (.csv, with a header row) file, one line at
+    a time so the file is never held in memory
+"""
+
+
+def read_records(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            # line 1 is the header
+            for number, record in enumerate(csv.DictReader(f), 2):
+                yield number, record
+            return
+
+        for number, line in enumerate(f, 1):
+            if line.strip():
+                try:
+                    yield number, json.loads(line)
+                except ValueError:
+                    yield number, None
+
+
+def normalize(text):
+    return " ".join(text.lower().split())
+
+
+"""
+QuestionLoader
+    bulk loads questions into the bank
+
+    categories is the {id: type} map of the valid categories, read once;
+    a record's category may be given by id or by type
+    a question whose normalized text (case and spacing ignored) is
+    already in the bank, or earlier in the file, is skipped
+    rows are written with one bulk insert and commit per batch_size
+    questions, and progress is reported through echo every
+    report_every records
+"""
+
+
+class QuestionLoader:
+    def __init__(self, categories, batch_size=1000, report_every=10000,
+                 echo=print):
+        self.category_ids = dict(categories)
+        self.category_ids.update(
+            {type.lower(): id for id, type in categories.items()}
+        )
+        self.batch_size = batch_size
+        self.report_every = report_every
+        self.echo = echo
+
+        self.seen = None
+        self.batch = []
+        self.stats = {"read": 0, "inserted": 0, "duplicates": 0,
+                      "invalid": 0}
+        self.started = None
+
+    """
+    row(record)
+        the column dict of a record, or raises ValueError naming what is
+        wrong with it
+    """
+
+    def row(self, record):
+        if not isinstance(record, dict):
+            raise ValueError("not a question record")
+
+        question = str(record.get("question") or "").strip()
+        answer = str(record.get("answer") or "").strip()
+        if not question or not answer:
+            raise ValueError("question and answer are required")
+
+        try:
+            difficulty = int(record.get("difficulty"))
+        except (TypeError, ValueError):
+            difficulty = None
+        if difficulty not in DIFFICULTIES:
+            raise ValueError("difficulty must be 1 to 5")
+
+        category = record.get("category")
+        if isinstance(category, str):
+            category = category.strip()
+            if category.isdigit():
+                category = int(category)
+            else:
+                category = self.category_ids.get(category.lower())
+        if category not in self.category_ids:
+            raise ValueError("unknown category")
+
+        return {
+            "question": question,
+            "answer": answer,
+            "difficulty": difficulty,
+            "category": category,
+        }
+
+    def load_seen(self):
+        self.seen = {
+            normalize(question)
+            for question, in db.session.query(Question.question)
+            .yield_per(10000)
+            if question
+        }
+
+    """
+    load(records)
+        loads (line number, record) pairs as read_records() yields them
+        returns the counts of read, inserted, duplicate and invalid
+        records
+    """
+
+    def load(self, records):
+        self.started = time.monotonic()
+        if self.seen is None:
+            self.load_seen()
+
+        for number, record in records:
+            self.stats["read"] += 1
+            try:
+                row = self.row(record)
+            except ValueError as e:
+                self.stats["invalid"] += 1
+                self.echo("line {}: {}".format(number, e))
+                continue
+
+            key = normalize(row["question"])
+            if key in self.seen:
+                self.stats["duplicates"] += 1
+                continue
+            self.seen.add(key)
+
+            self.batch.append(row)
+            if len(self.batch) >= self.batch_size:
+                self.flush()
+            if self.stats["read"] % self.report_every == 0:
+                self.report()
+
+        self.flush()
+        self.report()
+        return self.stats
+
+    def flush(self):
+        if not self.batch:
+            return
+        try:
+            db.session.bulk_insert_mappings(Question, self.batch)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        self.stats["inserted"] += len(self.batch)
+        self.batch = []
+
+    def report(self):
+        elapsed = time.monotonic() - self.started
+        self.echo(
+            "{read} read, {inserted} inserted, {duplicates} duplicates, "
+            "{invalid} invalid".format(**self.stats)
+            + " ({:.0f} questions/s)".format(
+                self.stats["read"] / elapsed if elapsed else 0
+            )
+        )
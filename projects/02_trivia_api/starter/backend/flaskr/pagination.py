@@ -0,0 +1,61 @@
+from collections import namedtuple
+
+from flask import abort
+
+"""
+Page
+    one page of a listing
+    items are the rows of the page, total is the number of rows in the
+    whole listing and next_cursor the id to pass as ?after= for the next
+    page (None on the last page)
+"""
+Page = namedtuple("Page", ["items", "total", "next_cursor"])
+
+
+"""
+page_args(args)
+    the validated (page, after) query string arguments of a listing
+    page defaults to 1; after is None unless keyset pagination is asked
+    for; aborts with 400 if either is not a positive integer
+"""
+
+
+def page_args(args):
+    page = args.get("page", "1")
+    after = args.get("after")
+    try:
+        page = int(page)
+        after = None if after is None else int(after)
+    except ValueError:
+        abort(400)
+    if page < 1 or (after is not None and after < 0):
+        abort(400)
+    return page, after
+
+
+"""
+paginate(query, key, page, per_page, after=None, count=None)
+    runs query for a single page ordered by the key column, with the
+    bounds in SQL: LIMIT/OFFSET for ?page=, or key > after for ?after=,
+    which stays fast however deep the page is
+    the total comes from count() if given, otherwise from a separate
+    COUNT of query
+"""
+
+
+def paginate(query, key, page, per_page, after=None, count=None):
+    total = count() if count is not None else query.order_by(None).count()
+
+    query = query.order_by(key)
+    if after is not None:
+        query = query.filter(key > after)
+    else:
+        query = query.offset((page - 1) * per_page)
+    # one extra row tells whether there is a next page
+    items = query.limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        next_cursor = getattr(items[-1], key.key)
+    return Page(items, total, next_cursor)
@@ -0,0 +1,84 @@
+import random
+import threading
+import time
+
+from models import Question, db
+
+# random draws tried before falling back to listing the unseen ids
+MAX_DRAWS = 16
+
+"""
+QuestionPool
+    the question ids of every category, held in memory so a quiz
+    question is drawn without scanning the questions table
+
+    draw(category_id, seen) picks a random id and retries when it was
+    already asked, which takes a few tries while the quiz has seen a
+    small part of the category; only when the category is nearly used
+    up does it list the ids that are left
+
+    the ids are reloaded when they are older than ttl seconds, or on
+    the next use after invalidate() was called by code that added or
+    removed a question
+"""
+
+
+class QuestionPool:
+    def __init__(self, ttl=300, rng=None):
+        self.ttl = ttl
+        self.rng = rng or random.Random()
+        self.version = 0
+        self.lock = threading.Lock()
+        self.loaded = None
+
+    """
+    load()
+        reads the id and category of every question
+        must run inside an application context
+    """
+
+    def load(self):
+        version = self.version
+        ids = {0: []}
+        for question_id, category in db.session.query(
+            Question.id, Question.category
+        ):
+            ids[0].append(question_id)
+            if category is not None:
+                ids.setdefault(category, []).append(question_id)
+        with self.lock:
+            self.loaded = (version, time.monotonic(), ids)
+        return self.loaded
+
+    def invalidate(self):
+        with self.lock:
+            self.version += 1
+
+    def ids(self, category_id):
+        loaded = self.loaded
+        if (
+            loaded is None
+            or loaded[0] != self.version
+            or time.monotonic() - loaded[1] >= self.ttl
+        ):
+            loaded = self.load()
+        return loaded[2].get(category_id, ())
+
+    """
+    draw(category_id, seen)
+        a random question id of the category (0 for every category)
+        that is not in the set seen, or None if there is none left
+    """
+
+    def draw(self, category_id, seen):
+        ids = self.ids(category_id)
+        if len(seen) < len(ids):
+            for _ in range(MAX_DRAWS):
+                question_id = ids[self.rng.randrange(len(ids))]
+                if question_id not in seen:
+                    return question_id
+
+        unseen = [id for id in ids if id not in seen]
+        if not unseen:
+            return None
+        return self.rng.choice(unseen)
@@ -0,0 +1,207 @@
+import threading
+
+from sqlalchemy import case, event, func, literal_column
+from sqlalchemy.orm import Session, object_session
+
+from models import db, Question
+from .pagination import Page
+
+"""
+search_text()
+    the question and answer text a search matches the term in
+    the expression the pg_trgm index in
+    migrations/001_question_search.sql is built on, keep them in sync
+"""
+
+
+def search_text():
+    empty = literal_column("''")
+    return (
+        func.coalesce(Question.question, empty) + literal_column("' '")
+        + func.coalesce(Question.answer, empty)
+    )
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+"""
+TrigramIndex
+    an in-process trigram index over question and answer text, for
+    databases without pg_trgm such as the SQLite files used in tests
+
+    a term of three or more characters is only checked against the
+    questions holding all of its trigrams
+    the index is built on the first search and kept current by the
+    Question mapper events; the changes they see are staged in the
+    session and only applied once it commits, so a rolled back write
+    never shows up in results
+    the index is shared by the threads of the process: building,
+    searching and applying a commit hold its lock, so a search never
+    sees a half applied change
+"""
+
+
+class TrigramIndex:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.documents = None
+        self.postings = {}
+        for name in ("after_insert", "after_update"):
+            event.listen(Question, name, self.on_write)
+        event.listen(Question, "after_delete", self.on_delete)
+        event.listen(Session, "after_commit", self.on_commit)
+        event.listen(Session, "after_transaction_end", self.on_end)
+
+    def reset(self):
+        with self.lock:
+            self.documents = None
+            self.postings = {}
+
+    def build(self):
+        with self.lock:
+            self.reset()
+            self.documents = {}
+            rows = db.session.query(
+                Question.id, Question.question, Question.answer
+            ).all()
+            for doc_id, question, answer in rows:
+                self.add(doc_id, question, answer)
+
+    def add(self, doc_id, question, answer):
+        with self.lock:
+            self.remove(doc_id)
+            question = (question or "").lower()
+            text = question + " " + (answer or "").lower()
+            self.documents[doc_id] = (question, text)
+            for trigram in trigrams(text):
+                self.postings.setdefault(trigram, set()).add(doc_id)
+
+    def remove(self, doc_id):
+        with self.lock:
+            document = self.documents.pop(doc_id, None)
+            if document is None:
+                return
+            for trigram in trigrams(document[1]):
+                self.postings[trigram].discard(doc_id)
+
+    """
+    search(term)
+        ids of the questions containing term, those with the term in
+        the question first
+    """
+
+    def search(self, term):
+        term = term.lower()
+        keys = trigrams(term)
+        with self.lock:
+            if self.documents is None:
+                self.build()
+
+            if keys:
+                candidates = set.intersection(
+                    *(self.postings.get(key, set()) for key in keys)
+                )
+            else:
+                candidates = self.documents.keys()
+
+            matches = [
+                (term not in self.documents[doc_id][0], doc_id)
+                for doc_id in candidates
+                if term in self.documents[doc_id][1]
+            ]
+        matches.sort()
+        return [doc_id for answer_only, doc_id in matches]
+
+    """
+    staged(target)
+        the changes flushed by the session of target and not committed
+        yet, question id -> (question, answer) or None once deleted
+    """
+
+    def staged(self, target):
+        return object_session(target).info.setdefault(self, {})
+
+    def on_write(self, mapper, connection, target):
+        self.staged(target)[target.id] = (target.question, target.answer)
+
+    def on_delete(self, mapper, connection, target):
+        self.staged(target)[target.id] = None
+
+    def on_commit(self, session):
+        if session.transaction is not None and session.transaction.nested:
+            return
+        staged = session.info.pop(self, None)
+        if not staged:
+            return
+        with self.lock:
+            if self.documents is None:
+                return
+            for doc_id, document in staged.items():
+                if document is None:
+                    self.remove(doc_id)
+                else:
+                    self.add(doc_id, *document)
+
+    def on_end(self, session, transaction):
+        # whatever was not committed was rolled back or abandoned
+        if transaction.parent is None:
+            session.info.pop(self, None)
+
+
+index = TrigramIndex()
+
+
+def escape_like(term):
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+"""
+search(term, page=1, per_page=10, backend="auto")
+    the Page of questions matching term
+    questions with the term in the question come before answer-only
+    matches; on PostgreSQL closer trigram matches come first after that
+    backend is "database" (an ILIKE the trigram index serves),
+    "memory" (TrigramIndex) or "auto": the database on PostgreSQL and
+    memory anywhere else
+"""
+
+
+def search(term, page=1, per_page=10, backend="auto"):
+    offset = (page - 1) * per_page
+    postgres = db.engine.dialect.name == "postgresql"
+    if backend == "auto":
+        backend = "database" if postgres else "memory"
+
+    if backend == "database":
+        pattern = "%" + escape_like(term) + "%"
+        query = Question.query.filter(
+            search_text().ilike(pattern, escape="\\")
+        )
+        order = [
+            case(
+                [(Question.question.ilike(pattern, escape="\\"), 0)],
+                else_=1,
+            )
+        ]
+        if postgres:
+            order.append(func.similarity(search_text(), term).desc())
+        questions = (
+            query.order_by(*order, Question.id)
+            .limit(per_page)
+            .offset(offset)
+            .all()
+        )
+        return Page(questions, query.count(), None)
+
+    ids = index.search(term)
+    page_ids = ids[offset:offset + per_page]
+    questions = []
+    if page_ids:
+        found = {
+            question.id: question
+            for question in Question.query.filter(Question.id.in_(page_ids))
+        }
+        questions = [found[id] for id in page_ids if id in found]
+    return Page(questions, len(ids), None)
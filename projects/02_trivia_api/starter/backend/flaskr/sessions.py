@@ -0,0 +1,274 @@
+import secrets
+import sqlite3
+import struct
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+# expiry time and cursor, followed by the question ids as uint32
+HEADER = struct.Struct("<dI")
+
+"""
+QuizSession
+    a quiz played on the server: the question ids drawn for it when it
+    started, in the order they will be asked, and a cursor at the next
+    one; stored as a few bytes per question
+"""
+
+
+class QuizSession:
+    def __init__(self, ids, cursor=0, expires_at=0):
+        self.ids = ids
+        self.cursor = cursor
+        self.expires_at = expires_at
+
+    def pack(self):
+        return HEADER.pack(self.expires_at, self.cursor) + self.ids.tobytes()
+
+    @classmethod
+    def unpack(cls, data):
+        expires_at, cursor = HEADER.unpack_from(data)
+        ids = array("I")
+        ids.frombytes(data[HEADER.size:])
+        return cls(ids, cursor, expires_at)
+
+    """
+    next_id()
+        the id of the next question, moving the cursor past it, or None
+        once every question was asked
+    """
+
+    def next_id(self):
+        if self.cursor >= len(self.ids):
+            return None
+        question_id = self.ids[self.cursor]
+        self.cursor += 1
+        return question_id
+
+    def remaining(self):
+        return len(self.ids) - self.cursor
+
+
+"""
+MemorySessionStore
+    packed sessions of one worker process, least recently used first
+    out once there are more than max_entries
+
+    update(token, change) replaces the data of a session with
+    change(data), or deletes the session when that is None, as one step
+    no other get, put or update of the store runs in between
+"""
+
+
+class MemorySessionStore:
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, token):
+        with self.lock:
+            data = self.entries.get(token)
+            if data is not None:
+                self.entries.move_to_end(token)
+            return data
+
+    def put(self, token, data):
+        with self.lock:
+            self.entries[token] = data
+            self.entries.move_to_end(token)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def update(self, token, change):
+        with self.lock:
+            data = self.entries.get(token)
+            if data is None:
+                return None
+            data = change(data)
+            if data is None:
+                del self.entries[token]
+            else:
+                self.entries[token] = data
+                self.entries.move_to_end(token)
+            return data
+
+    def delete(self, token):
+        with self.lock:
+            self.entries.pop(token, None)
+
+
+"""
+SQLiteSessionStore
+    packed sessions in a local SQLite file, shared by every worker
+    process on the machine and kept across restarts
+    expired sessions are removed when new ones are stored
+
+    update() reads and writes the session in one IMMEDIATE transaction,
+    which holds the write lock of the file from the read on, so workers
+    stepping the same session take turns
+"""
+
+
+class SQLiteSessionStore:
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        self.connection().execute(
+            "CREATE TABLE IF NOT EXISTS quiz_sessions "
+            "(token TEXT PRIMARY KEY, expires_at REAL, data BLOB)"
+        )
+
+    def connection(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None
+            )
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            self.local.connection = connection
+        return connection
+
+    def get(self, token):
+        row = self.connection().execute(
+            "SELECT data FROM quiz_sessions WHERE token = ?", (token,)
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def put(self, token, data):
+        expires_at = HEADER.unpack_from(data)[0]
+        connection = self.connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO quiz_sessions VALUES (?, ?, ?)",
+            (token, expires_at, data),
+        )
+
+    def update(self, token, change):
+        connection = self.connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                "SELECT data FROM quiz_sessions WHERE token = ?", (token,)
+            ).fetchone()
+            data = None if row is None else change(row[0])
+            if data is not None:
+                connection.execute(
+                    "UPDATE quiz_sessions SET data = ? WHERE token = ?",
+                    (data, token),
+                )
+            elif row is not None:
+                connection.execute(
+                    "DELETE FROM quiz_sessions WHERE token = ?", (token,)
+                )
+            connection.execute("COMMIT")
+        except BaseException:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            raise
+        return data
+
+    def delete(self, token):
+        self.connection().execute(
+            "DELETE FROM quiz_sessions WHERE token = ?", (token,)
+        )
+
+    def purge(self):
+        self.connection().execute(
+            "DELETE FROM quiz_sessions WHERE expires_at < ?", (time.time(),)
+        )
+
+
+"""
+store_from_config(setting, max_entries)
+    "memory" for a MemorySessionStore, or "sqlite:<path>" for a
+    SQLiteSessionStore at path
+"""
+
+
+def store_from_config(setting, max_entries=10000):
+    if setting.startswith("sqlite:"):
+        return SQLiteSessionStore(setting[len("sqlite:"):])
+    if setting == "memory":
+        return MemorySessionStore(max_entries)
+    raise ValueError("unknown quiz session store {!r}".format(setting))
+
+
+"""
+QuizSessions
+    starts quiz sessions and serves their questions
+
+    start() draws the questions of the whole quiz up front from the
+    QuestionPool ids, so every later next_id() is a store lookup and a
+    cursor step whatever the quiz length, and the client only sends the
+    session token back
+
+    the cursor is stepped with the store's update(), so two requests
+    for the next question of the same session never get the same one
+"""
+
+
+class QuizSessions:
+    def __init__(self, pool, store, ttl=3600):
+        self.pool = pool
+        self.store = store
+        self.ttl = ttl
+        self.started = 0
+
+    """
+    start(category_id, length)
+        draws length questions (fewer if the category has fewer) of the
+        category, 0 for every category, and returns (token, session)
+    """
+
+    def start(self, category_id, length):
+        ids = self.pool.ids(category_id)
+        drawn = self.pool.rng.sample(ids, min(length, len(ids)))
+        session = QuizSession(
+            array("I", drawn), expires_at=time.time() + self.ttl
+        )
+        token = secrets.token_urlsafe(16)
+        self.store.put(token, session.pack())
+
+        self.started += 1
+        if hasattr(self.store, "purge") and self.started % 100 == 0:
+            self.store.purge()
+        return token, session
+
+    """
+    get(token)
+        the session, or None if there is no such session or it expired
+    """
+
+    def get(self, token):
+        data = self.store.get(token)
+        if data is None:
+            return None
+        session = QuizSession.unpack(data)
+        if session.expires_at < time.time():
+            self.store.delete(token)
+            return None
+        return session
+
+    """
+    next_id(token)
+        moves the cursor of the session past its next question and
+        returns (question id, session), the id being None once every
+        question was asked; None if there is no such session or it
+        expired
+    """
+
+    def next_id(self, token):
+        stepped = []
+
+        def step(data):
+            session = QuizSession.unpack(data)
+            if session.expires_at < time.time():
+                return None
+            stepped[:] = [session.next_id(), session]
+            return session.pack()
+
+        if self.store.update(token, step) is None:
+            return None
+        return tuple(stepped)
@@ -0,0 +1,11 @@
+-- Trigram index for POST /questions/search (PostgreSQL only).
+-- The indexed expression must stay in sync with flaskr/search.py
+-- search_text(), or the planner falls back to a full table scan.
+--
+--     psql trivia < migrations/001_question_search.sql
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS ix_questions_search_trgm ON public.questions
+    USING gin ((coalesce(question, '') || ' ' || coalesce(answer, ''))
+               gin_trgm_ops);
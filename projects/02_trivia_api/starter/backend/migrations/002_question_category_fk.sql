@@ -0,0 +1,33 @@
+-- Makes questions.category an integer foreign key to categories.id and
+-- indexes (category, id) for the category listings and quiz draws.
+-- Databases restored from trivia.psql already have the integer column
+-- and the foreign key; tables created by an older models.py have a
+-- varchar column. Safe to run more than once.
+--
+--     psql trivia < migrations/002_question_category_fk.sql
+
+BEGIN;
+
+ALTER TABLE public.questions
+    ALTER COLUMN category TYPE integer USING category::integer;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conrelid = 'public.questions'::regclass AND contype = 'f'
+    ) THEN
+        ALTER TABLE public.questions
+            ADD CONSTRAINT category FOREIGN KEY (category)
+            REFERENCES public.categories (id)
+            ON UPDATE CASCADE ON DELETE SET NULL;
+    END IF;
+END
+$$;
+
+CREATE INDEX IF NOT EXISTS ix_questions_category_id
+    ON public.questions (category, id);
+
+COMMIT;
+
+ANALYZE public.questions;
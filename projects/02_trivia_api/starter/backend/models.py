@@ -1,10 +1,20 @@
 import os
-from sqlalchemy import Column, String, Integer, create_engine
+from sqlalchemy import (
+    Column,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    create_engine,
+)
 from flask_sqlalchemy import SQLAlchemy
 import json
 
 database_name = "trivia"
-database_path = "postgres://{}/{}".format("localhost:5432", database_name)
+database_path = os.environ.get(
+    "DATABASE_URL",
+    "postgres://{}/{}".format("localhost:5432", database_name),
+)
 
 db = SQLAlchemy()
 
@@ -30,11 +40,18 @@ Question
 
 class Question(db.Model):
     __tablename__ = "questions"
+    __table_args__ = (
+        # serves category listings in id order and their counts
+        Index("ix_questions_category_id", "category", "id"),
+    )
 
     id = Column(Integer, primary_key=True)
     question = Column(String)
     answer = Column(String)
-    category = Column(String)
+    category = Column(
+        Integer,
+        ForeignKey("categories.id", onupdate="CASCADE", ondelete="SET NULL"),
+    )
     difficulty = Column(Integer)
 
     def __init__(self, question, answer, category, difficulty):
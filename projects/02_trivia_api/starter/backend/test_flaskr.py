@@ -1,9 +1,14 @@
 import os
+import random
+import threading
 import unittest
 import json
 from flask_sqlalchemy import SQLAlchemy
 
 from flaskr import create_app
+from flaskr.loader import QuestionLoader
+from flaskr.search import index
+from flaskr.sessions import MemorySessionStore, QuizSessions
 from models import setup_db, Question, Category, db
 
 
@@ -38,6 +43,16 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(res.status_code, 200)
         self.assertEqual(date["success"], True)
 
+    def test_get_categories_matches_database(self):
+        res = self.client().get("/categories")
+        data = json.loads(res.data)
+
+        categories = Category.query.all()
+        self.assertEqual(
+            data["categories"],
+            {str(category.id): category.type for category in categories},
+        )
+
     def test_fail_get_categories(self):
         res = self.client().post("/categories")
 
@@ -66,6 +81,31 @@ class TriviaTestCase(unittest.TestCase):
             data["current_category"], list(categories_dict.values()))
         self.assertEqual(len(data["questions"]), 10)
 
+    def test_get_questions_pages(self):
+        res = self.client().get("/questions?page=2")
+        data = json.loads(res.data)
+        first_page = json.loads(self.client().get("/questions").data)
+
+        questions = Question.query.order_by(Question.id).all()
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(
+            [question["id"] for question in data["questions"]],
+            [question.id for question in questions[10:20]],
+        )
+
+        res = self.client().get(
+            "/questions?after={}".format(first_page["next_cursor"]))
+        data_after = json.loads(res.data)
+        self.assertEqual(data_after["questions"], data["questions"])
+
+    def test_fail_get_questions_bad_page(self):
+        res = self.client().get("/questions?page=0")
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(data["success"], False)
+        self.assertEqual(data["message"], "Bad Request")
+
     def test_fail_get_questions(self):
         res = self.client().put("/questions")
 
@@ -114,6 +154,19 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(new_question.difficulty, question_data["difficulty"])
         self.assertEqual(new_question.category, question_data["category"])
 
+    def test_create_question_updates_counts(self):
+        before = json.loads(self.client().get("/categories/3/questions").data)
+        self.client().post("/questions", json={
+            "question": "Which is the largest ocean?",
+            "answer": "Pacific",
+            "difficulty": 1,
+            "category": 3,
+        })
+        after = json.loads(self.client().get("/categories/3/questions").data)
+
+        self.assertEqual(
+            after["total_num_questions"], before["total_num_questions"] + 1)
+
     def test_fail_create_question(self):
         # try add a courrpt question, missing category
         question_data1 = {
@@ -142,6 +195,34 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(data["success"], True)
         self.assertEqual(data["total_num_questions"], 2)
 
+    def test_search_question_matches_answers(self):
+        res = self.client().post(
+            "/questions/search", json={"query": "scissorhands"})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data["total_num_questions"], 1)
+        self.assertEqual(data["questions"][0]["answer"], "Edward Scissorhands")
+
+    def test_search_index_skips_rolled_back_writes(self):
+        with self.app.app_context():
+            index.build()
+            question = Question(
+                question="Which metal is liquid at room temperature?",
+                answer="Mercury", difficulty=2, category=1)
+            db.session.add(question)
+            db.session.flush()
+            db.session.rollback()
+            self.assertEqual(index.search("liquid at room"), [])
+
+            db.session.add(question)
+            db.session.commit()
+            self.assertEqual(index.search("liquid at room"), [question.id])
+
+            db.session.delete(question)
+            db.session.commit()
+            self.assertEqual(index.search("liquid at room"), [])
+
     def test_fail_search_question(self):
         res = self.client().get("/questions/search?query='mmm'")
         self.assertEqual(res.status_code, 405)
@@ -198,6 +279,64 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(data["success"], True)
         self.assertEqual(data["previous_questions"], [20, 21, 22])
 
+    def test_quiz_all_categories_skips_previous_questions(self):
+        questions = Question.query.order_by(Question.id).all()
+        previous_questions = [question.id for question in questions[1:]]
+        res = self.client().post(
+            "/quizzes",
+            json={
+                "quiz_category": {"type": "click", "id": "0"},
+                "previous_questions": previous_questions,
+            },
+        )
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data["question"]["id"], questions[0].id)
+
+    def test_quiz_session(self):
+        res = self.client().post(
+            "/quizzes/sessions",
+            json={"quiz_category": {"type": "Science", "id": 1}, "length": 2},
+        )
+        data = json.loads(res.data)
+        token = data["quiz_session"]
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data["remaining"], 2)
+
+        asked = []
+        for remaining in (1, 0):
+            res = self.client().post("/quizzes/sessions/{}/next".format(token))
+            data = json.loads(res.data)
+            self.assertEqual(data["remaining"], remaining)
+            self.assertEqual(data["question"]["category"], 1)
+            asked.append(data["question"]["id"])
+        self.assertEqual(len(set(asked)), 2)
+
+        res = self.client().post("/quizzes/sessions/{}/next".format(token))
+        data = json.loads(res.data)
+        self.assertEqual(data["success"], True)
+        self.assertNotIn("question", data)
+
+    def test_fail_quiz_session(self):
+        res = self.client().post("/quizzes/sessions/no-such-session/next")
+        self.assertEqual(res.status_code, 404)
+
+        res = self.client().post("/quizzes/sessions", json={"length": 0})
+        self.assertEqual(res.status_code, 422)
+
+        for body in ([1], {"quiz_category": 1}, {"quiz_category": [1]}):
+            res = self.client().post("/quizzes/sessions", json=body)
+            self.assertEqual(res.status_code, 422)
+
+        # non-existing category
+        res = self.client().post(
+            "/quizzes/sessions",
+            json={"quiz_category": {"type": "Science", "id": 9}},
+        )
+        self.assertEqual(res.status_code, 422)
+
     def test_fail_quiz(self):
         res = self.client().get("/quizzes",)
         self.assertEqual(res.status_code, 405)
@@ -218,6 +357,86 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(data["previous_questions"], [])
 
 
+class QuestionLoaderTestCase(unittest.TestCase):
+    """Validation of the records load-questions reads"""
+
+    def setUp(self):
+        self.loader = QuestionLoader({1: "Science", 2: "Art"})
+
+    def test_row(self):
+        row = self.loader.row({
+            "question": " What is H2O? ",
+            "answer": "Water",
+            "difficulty": "2",
+            "category": "science",
+        })
+
+        self.assertEqual(row, {
+            "question": "What is H2O?",
+            "answer": "Water",
+            "difficulty": 2,
+            "category": 1,
+        })
+        self.assertEqual(self.loader.row({
+            "question": "q", "answer": "a", "difficulty": 5, "category": "2"
+        })["category"], 2)
+
+    def test_fail_row(self):
+        valid = {"question": "q", "answer": "a", "difficulty": 1,
+                 "category": 1}
+        for change in (
+            {"question": ""},
+            {"answer": None},
+            {"difficulty": 6},
+            {"difficulty": "hard"},
+            {"category": 7},
+            {"category": "Sports"},
+        ):
+            record = dict(valid, **change)
+            with self.assertRaises(ValueError):
+                self.loader.row(record)
+
+
+class QuizSessionsTestCase(unittest.TestCase):
+    """Stepping quiz sessions held in a MemorySessionStore"""
+
+    class Pool:
+        rng = random.Random(0)
+
+        def ids(self, category_id):
+            return list(range(1, 101))
+
+    def setUp(self):
+        self.sessions = QuizSessions(self.Pool(), MemorySessionStore())
+
+    def test_next_id_concurrently(self):
+        token, session = self.sessions.start(0, 100)
+        asked = []
+
+        def ask():
+            while True:
+                question_id, session = self.sessions.next_id(token)
+                if question_id is None:
+                    return
+                asked.append(question_id)
+
+        threads = [threading.Thread(target=ask) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertCountEqual(asked, range(1, 101))
+        self.assertEqual(self.sessions.next_id(token)[1].remaining(), 0)
+
+    def test_fail_next_id(self):
+        self.assertIsNone(self.sessions.next_id("no-such-session"))
+
+        self.sessions.ttl = -1
+        token, session = self.sessions.start(0, 3)
+        self.assertIsNone(self.sessions.next_id(token))
+
+
 # Make the tests conveniently executable
 if __name__ == "__main__":
     unittest.main()
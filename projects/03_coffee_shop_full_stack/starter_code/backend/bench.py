@@ -0,0 +1,251 @@
+"""Per request overhead benchmarks for the coffee shop backend.
+
+    python bench.py            # every benchmark
+    python bench.py auth auth_uncached
+    python bench.py menu menu_uncached menu_not_modified
+    python bench.py concurrent
+
+Tokens are signed with a throwaway RSA key whose JWKS is served from a
+temporary file, so no Auth0 tenant or network access is needed. The menu
+benchmarks run against a throwaway SQLite file (or whatever DATABASE_URL
+points at) seeded with MENU_SIZE drinks.
+"""
+import base64
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from Crypto.PublicKey import RSA
+
+KID = "bench-key"
+REQUESTS = 200
+MENU_SIZE = 200
+INGREDIENTS = [
+    ("espresso", "#6f4e37"),
+    ("milk", "#fdfff5"),
+    ("foam", "#f5f5dc"),
+    ("chocolate", "#7b3f00"),
+    ("caramel", "#af6f09"),
+    ("water", "#d4f1f9"),
+]
+READERS = 8
+WRITERS = 2
+
+signing_key = RSA.generate(2048)
+
+
+def b64url_uint(value):
+    data = value.to_bytes((value.bit_length() + 7) // 8, "big")
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+jwks_path = os.path.join(tempfile.mkdtemp(), "jwks.json")
+with open(jwks_path, "w") as f:
+    json.dump(
+        {
+            "keys": [
+                {
+                    "kty": "RSA",
+                    "kid": KID,
+                    "use": "sig",
+                    "n": b64url_uint(signing_key.n),
+                    "e": b64url_uint(signing_key.e),
+                }
+            ]
+        },
+        f,
+    )
+os.environ.setdefault("JWKS_URL", "file://" + jwks_path)
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = "sqlite:///{}".format(
+        os.path.join(tempfile.mkdtemp(), "coffee_bench.db")
+    )
+
+from flask import Flask, jsonify  # noqa: E402
+from jose import jwt  # noqa: E402
+
+from src.auth import auth  # noqa: E402
+
+
+def make_token(permissions, lifetime=3600):
+    now = int(time.time())
+    claims = {
+        "iss": "https://{}/".format(auth.AUTH0_DOMAIN),
+        "aud": auth.API_AUDIENCE,
+        "sub": "bench|user",
+        "iat": now,
+        "exp": now + lifetime,
+        "permissions": permissions,
+    }
+    return jwt.encode(
+        claims,
+        signing_key.exportKey("PEM").decode("ascii"),
+        algorithm="RS256",
+        headers={"kid": KID},
+    )
+
+
+def auth_app():
+    """A bare app with one protected route, so only auth is measured."""
+    app = Flask(__name__)
+
+    @app.route("/protected")
+    @auth.requires_auth("get:drinks-detail")
+    def protected(payload):
+        return jsonify({"success": True})
+
+    return app
+
+
+def time_requests(client, path, headers, before=None, requests=REQUESTS,
+                  status=200):
+    """Average wall time in milliseconds of GET path, after a warm-up."""
+    client.get(path, headers=headers)
+    start = time.perf_counter()
+    for _ in range(requests):
+        if before is not None:
+            before()
+        response = client.get(path, headers=headers)
+        assert response.status_code == status, response.status
+    return (time.perf_counter() - start) * 1000 / requests
+
+
+def bench_auth():
+    headers = {"Authorization": "Bearer " + make_token(["get:drinks-detail"])}
+    return time_requests(auth_app().test_client(), "/protected", headers)
+
+
+def bench_auth_uncached():
+    headers = {"Authorization": "Bearer " + make_token(["get:drinks-detail"])}
+    return time_requests(
+        auth_app().test_client(),
+        "/protected",
+        headers,
+        before=auth.verified_tokens.clear,
+    )
+
+
+def menu_app():
+    """The coffee shop app, its database seeded with the bench menu."""
+    from src.api import app, menu_cache
+    from src.database.models import db, Drink
+
+    with app.app_context():
+        db.create_all()
+        if Drink.query.count() != MENU_SIZE:
+            db.drop_all()
+            db.create_all()
+            db.session.add_all(
+                Drink(
+                    title="Drink {}".format(i),
+                    recipe=[
+                        {"name": name, "color": color, "parts": 1 + j % 3}
+                        for j, (name, color) in enumerate(
+                            INGREDIENTS[i % 3:i % 3 + 3 + i % 2]
+                        )
+                    ],
+                )
+                for i in range(MENU_SIZE)
+            )
+            db.session.commit()
+    menu_cache.bump()
+    return app
+
+
+def bench_menu():
+    return time_requests(menu_app().test_client(), "/drinks", {})
+
+
+def bench_menu_uncached():
+    from src.api import menu_cache
+
+    return time_requests(
+        menu_app().test_client(), "/drinks", {}, before=menu_cache.bump
+    )
+
+
+def bench_menu_not_modified():
+    client = menu_app().test_client()
+    etag = client.get("/drinks").headers["ETag"]
+    return time_requests(
+        client, "/drinks", {"If-None-Match": etag}, status=304
+    )
+
+
+def bench_concurrent(readers=READERS, writers=WRITERS, requests=REQUESTS):
+    """GET /drinks from reader threads while writer threads add and
+    remove drinks; the average wall time per request over all threads.
+
+    Every write invalidates the menu, so readers keep going back to the
+    database while writers hold its write lock.
+    """
+    app = menu_app()
+    headers = {
+        "Authorization": "Bearer "
+        + make_token(["post:drinks", "delete:drinks"])
+    }
+    recipe = {"name": "water", "color": "blue", "parts": 1}
+    failures = []
+
+    def read():
+        client = app.test_client()
+        for _ in range(requests):
+            response = client.get("/drinks")
+            if response.status_code != 200:
+                failures.append(response.status)
+
+    def write(worker):
+        client = app.test_client()
+        for n in range(requests // 2):
+            response = client.post(
+                "/drinks",
+                headers=headers,
+                json={"title": "bench {} {}".format(worker, n),
+                      "recipe": recipe},
+            )
+            if response.status_code != 200:
+                failures.append(response.status)
+                continue
+            drink_id = response.get_json()["drinks"][0]["id"]
+            response = client.delete(
+                "/drinks/{}".format(drink_id), headers=headers
+            )
+            if response.status_code != 200:
+                failures.append(response.status)
+
+    threads = [threading.Thread(target=read) for _ in range(readers)]
+    threads += [
+        threading.Thread(target=write, args=(worker,))
+        for worker in range(writers)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    assert not failures, failures[:5]
+    return elapsed * 1000 / ((readers + writers) * requests)
+
+
+BENCHMARKS = {
+    "auth": bench_auth,
+    "auth_uncached": bench_auth_uncached,
+    "menu": bench_menu,
+    "menu_uncached": bench_menu_uncached,
+    "menu_not_modified": bench_menu_not_modified,
+    "concurrent": bench_concurrent,
+}
+
+
+def main(names):
+    for name in names or BENCHMARKS:
+        print("{:<20} {:>10.3f} ms/request".format(name, BENCHMARKS[name]()))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,11 +1,32 @@
 import os
-from flask import Flask, request, jsonify, abort
+from flask import (
+    Flask,
+    request,
+    jsonify,
+    abort,
+    Response,
+    stream_with_context,
+)
 from sqlalchemy import exc
+from sqlalchemy.orm import load_only
 import json
 from flask_cors import CORS
 
-from .database.models import db_drop_and_create_all, setup_db, Drink
-from .auth.auth import AuthError, requires_auth
+from .database.models import (
+    apply_drink_batch,
+    db_drop_and_create_all,
+    migrate_recipe_json,
+    setup_db,
+    Drink,
+)
+from .auth.auth import (
+    AuthError,
+    check_permissions,
+    current_permissions,
+    requires_auth,
+)
+from .auth.rbac import all_of, any_of
+from .menu_cache import MenuCache
 
 app = Flask(__name__)
 setup_db(app)
@@ -13,33 +34,104 @@ CORS(app)
 
 # db_drop_and_create_all()
 
+
+@app.cli.command("migrate-recipes")
+def migrate_recipes():
+    """Move drink recipes from the old string column to JSON columns."""
+    migrate_recipe_json()
+
+
+"""
+parse_recipe(recipe)
+    a recipe sent by a client as a list of ingredients, accepting a
+    single ingredient as well as the list the frontend sends
+    returns None if an ingredient has no color or parts
+"""
+
+
+def parse_recipe(recipe):
+    if not isinstance(recipe, list):
+        recipe = [recipe]
+    for ingredient in recipe:
+        if not isinstance(ingredient, dict):
+            return None
+        if "color" not in ingredient or "parts" not in ingredient:
+            return None
+    return recipe
+
+
 # ROUTES
 """
     GET /drinks
         it should be a public endpoint
         it should contain only the drink.short() data representation
+        the serialized menu is cached until the next write; it carries an
+        ETag and an If-None-Match request for it is answered with 304
     returns status code 200 and json {"success": True, "drinks": drinks}
         where drinks is the list of drinks
         or appropriate status code indicating reason for failure
 """
 
 
+def serialize_menu():
+    drinks = Drink.query.options(load_only("id", "title", "short_recipe"))
+    return json.dumps({
+        "success": True,
+        "drinks": [drink.short() for drink in drinks]
+    }).encode("utf-8")
+
+
+menu_cache = MenuCache(
+    serialize_menu, ttl=int(os.environ.get("MENU_CACHE_TTL", 60))
+)
+
+
 @app.route("/drinks", methods=["GET"])
 def get_drinks():
-    drinks = Drink.query.all()
+    body, etag = menu_cache.get()
+
+    response = Response(body, status=200, mimetype="application/json")
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+
+# fields of drink.long() a client can ask for with ?fields=
+DETAIL_FIELDS = ("id", "title", "recipe")
+MAX_DRINKS_PER_PAGE = 100
+# rows fetched from the database at a time while streaming every drink
+STREAM_BATCH_SIZE = 100
+
+"""
+stream_drinks(rows, fields, next_cursor)
+    yields the {"success": True, "drinks": [...], "next_cursor": ...}
+    document one drink at a time, so the whole list is never held in
+    memory as Python objects or as one JSON string
+    rows are column tuples holding at least fields; each drink has the
+    same keys and values as in drink.long()
+"""
 
-    return jsonify({
-        "success": True,
-        "drinks": [drink.short() for drink in drinks]
-    }), 200
+
+def stream_drinks(rows, fields, next_cursor):
+    yield '{"success": true, "drinks": ['
+    separator = ""
+    for row in rows:
+        yield separator + json.dumps({f: getattr(row, f) for f in fields})
+        separator = ", "
+    yield '], "next_cursor": {}}}'.format(json.dumps(next_cursor))
 
 
 """
     GET /drinks-detail
         it should require the 'get:drinks-detail' permission
         it should contain the drink.long() data representation
-    returns status code 200 and json {"success": True, "drinks": drinks}
-        where drinks is the list of drinks
+        ?fields=id,title limits each drink to the listed fields
+        ?limit=n returns at most n drinks (up to MAX_DRINKS_PER_PAGE)
+        ordered by id, and ?after=<next_cursor> the page after that;
+        without limit every drink is streamed
+    returns status code 200 and json
+        {"success": True, "drinks": drinks, "next_cursor": cursor}
+        where drinks is the list of drinks and cursor is the id to pass
+        as after for the next page, or null on the last page
         or appropriate status code indicating reason for failure
 """
 
@@ -47,12 +139,40 @@ def get_drinks():
 @app.route("/drinks-detail", methods=["GET"])
 @requires_auth("get:drinks-detail")
 def get_drinks_details(payload):
-    drinks = Drink.query.all()
-
-    return jsonify({
-        "success": True,
-        "drinks": [drink.long() for drink in drinks]
-    }), 200
+    fields = DETAIL_FIELDS
+    if "fields" in request.args:
+        fields = tuple(
+            f.strip() for f in request.args["fields"].split(",")
+            if f.strip()
+        )
+        if not fields or not set(fields) <= set(DETAIL_FIELDS):
+            abort(422)
+
+    limit = request.args.get("limit", type=int)
+    after = request.args.get("after", type=int)
+    if limit is not None and not 0 < limit <= MAX_DRINKS_PER_PAGE:
+        abort(422)
+
+    # only the selected columns are read, plus id for the cursor
+    columns = [Drink.id] + [getattr(Drink, f) for f in fields if f != "id"]
+    drinks = Drink.query.with_entities(*columns).order_by(Drink.id)
+    if after is not None:
+        drinks = drinks.filter(Drink.id > after)
+
+    next_cursor = None
+    if limit is None:
+        drinks = drinks.yield_per(STREAM_BATCH_SIZE)
+    else:
+        drinks = drinks.limit(limit + 1).all()
+        if len(drinks) > limit:
+            drinks = drinks[:limit]
+            next_cursor = drinks[-1].id
+
+    return Response(
+        stream_with_context(stream_drinks(drinks, fields, next_cursor)),
+        status=200,
+        mimetype="application/json",
+    )
 
 
 """
@@ -71,10 +191,13 @@ def get_drinks_details(payload):
 def create_drink(payload):
     data = request.get_json()
     title = data.get("title", None)
-    recipe = data.get("recipe", None)
+    recipe = parse_recipe(data.get("recipe", None))
+    if recipe is None:
+        abort(422)
 
-    drink = Drink(title=title, recipe=json.dumps([recipe]))
+    drink = Drink(title=title, recipe=recipe)
     drink.insert()
+    menu_cache.bump()
 
     return jsonify({"success": True, "drinks": [drink.long()]}), 200
 
@@ -107,9 +230,13 @@ def update_drink(payload, drink_id):
         drink.title = title
 
     if recipe:
-        drink.recipe = json.dumps([recipe])
+        recipe = parse_recipe(recipe)
+        if recipe is None:
+            abort(422)
+        drink.recipe = recipe
 
     drink.update()
+    menu_cache.bump()
 
     return jsonify({"success": True, "drinks": [drink.long()]}), 200
 
@@ -134,10 +261,173 @@ def delete_drink(payload, drink_id):
         abort(404)
 
     drink.delete()
+    menu_cache.bump()
 
     return jsonify({"success": True, "delete": drink_id}), 200
 
 
+# the permission each kind of batch operation needs
+BATCH_PERMISSIONS = {
+    "create": "post:drinks",
+    "update": "patch:drinks",
+    "delete": "delete:drinks",
+}
+# compiled once, like the requirements of requires_auth
+BATCH_REQUIREMENTS = {
+    op: all_of(permission) for op, permission in BATCH_PERMISSIONS.items()
+}
+MAX_BATCH_OPERATIONS = 1000
+
+
+def batch_error(op, status):
+    message = "Resoruce Not Found" if status == 404 else "unprocessable"
+    return {"op": op, "success": False, "error": status, "message": message}
+
+
+"""
+    POST /drinks/batch
+        it should require the 'post:drinks', 'patch:drinks' or
+            'delete:drinks' permission needed by each operation in it
+        it should accept json {"operations": operations} where each
+            operation is one of
+            {"op": "create", "title": title, "recipe": recipe}
+            {"op": "update", "id": id, "title": title, "recipe": recipe}
+            {"op": "delete", "id": id}
+        it should apply every valid operation in a single transaction
+        an operation on a drink that does not exist, or that would reuse
+            a taken title, fails on its own without affecting the others
+    returns status code 200 and json {"success": True, "results": results}
+        where results holds, in order, the outcome of each operation:
+        {"op": op, "success": True, "drink": drink} for create and update
+        with the drink.long() data representation,
+        {"op": "delete", "success": True, "delete": id} for delete, or
+        {"op": op, "success": False, "error": status, "message": message}
+        or appropriate status code indicating reason for failure
+"""
+
+
+@app.route("/drinks/batch", methods=["POST"])
+@requires_auth(any_of(*BATCH_PERMISSIONS.values()))
+def batch_drinks(payload):
+    data = request.get_json(silent=True) or {}
+    operations = data.get("operations")
+    if not isinstance(operations, list) or not operations:
+        abort(422)
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        abort(422)
+    if not all(isinstance(operation, dict) for operation in operations):
+        abort(422)
+
+    granted = current_permissions()
+    ops = {operation.get("op") for operation in operations
+           if isinstance(operation.get("op"), str)}
+    for op in ops & BATCH_REQUIREMENTS.keys():
+        check_permissions(BATCH_REQUIREMENTS[op], payload, granted)
+
+    results = [None] * len(operations)
+    # index of the operation, and its column dict or id
+    creates, updates, deletes = [], [], []
+    touched = set()
+    for index, operation in enumerate(operations):
+        op = operation.get("op")
+        row = {}
+        if "title" in operation:
+            row["title"] = operation["title"]
+            if not isinstance(row["title"], str) or not row["title"]:
+                results[index] = batch_error(op, 422)
+                continue
+        if "recipe" in operation:
+            row["recipe"] = parse_recipe(operation["recipe"])
+            if row["recipe"] is None:
+                results[index] = batch_error(op, 422)
+                continue
+
+        if op == "create" and "title" in row and "recipe" in row:
+            creates.append((index, row))
+            continue
+
+        drink_id = operation.get("id")
+        if (
+            op not in ("update", "delete")
+            or not isinstance(drink_id, int)
+            or drink_id in touched
+            or (op == "update" and not row)
+        ):
+            results[index] = batch_error(op, 422)
+            continue
+        touched.add(drink_id)
+        if op == "update":
+            row["id"] = drink_id
+            updates.append((index, row))
+        else:
+            deletes.append((index, drink_id))
+
+    existing = {
+        drink.id: drink.title
+        for drink in Drink.query.options(load_only("id", "title"))
+        .filter(Drink.id.in_(touched))
+    }
+    for index, value in updates + deletes:
+        drink_id = value["id"] if isinstance(value, dict) else value
+        if drink_id not in existing:
+            results[index] = batch_error(operations[index]["op"], 404)
+    updates = [(i, row) for i, row in updates if results[i] is None]
+    deletes = [(i, drink_id) for i, drink_id in deletes if results[i] is None]
+
+    # replay the titles in the order apply_drink_batch writes them:
+    # deletes, then updates in batch order, then creates, so a title is
+    # only reused once the statement freeing it has run
+    wanted = [(i, row) for i, row in updates + creates if "title" in row]
+    taken = {
+        drink.title
+        for drink in Drink.query.options(load_only("id", "title"))
+        .filter(Drink.title.in_([row["title"] for _, row in wanted]))
+    }
+    taken -= {existing[drink_id] for _, drink_id in deletes}
+    for index, row in wanted:
+        current = existing.get(row.get("id"))
+        if row["title"] in taken and row["title"] != current:
+            results[index] = batch_error(operations[index]["op"], 422)
+            continue
+        taken.discard(current)
+        taken.add(row["title"])
+    updates = [(i, row) for i, row in updates if results[i] is None]
+    creates = [(i, row) for i, row in creates if results[i] is None]
+
+    try:
+        created = apply_drink_batch(
+            [row for _, row in creates],
+            [row for _, row in updates],
+            [drink_id for _, drink_id in deletes],
+        )
+    except exc.SQLAlchemyError:
+        abort(422)
+    if creates or updates or deletes:
+        menu_cache.bump()
+
+    for (index, _), drink_id in zip(creates, created):
+        results[index] = drink_id
+    for index, row in updates:
+        results[index] = row["id"]
+    drinks = {
+        drink.id: drink
+        for drink in Drink.query.filter(
+            Drink.id.in_([r for r in results if isinstance(r, int)])
+        )
+    }
+    for index, result in enumerate(results):
+        if isinstance(result, int):
+            results[index] = {
+                "op": operations[index]["op"],
+                "success": True,
+                "drink": drinks[result].long(),
+            }
+    for index, drink_id in deletes:
+        results[index] = {"op": "delete", "success": True, "delete": drink_id}
+
+    return jsonify({"success": True, "results": results}), 200
+
+
 # Error Handling
 """
 Example error handling for unprocessable entity
@@ -1,14 +1,30 @@
-import json
+import os
 from flask import request, _request_ctx_stack
 from functools import wraps
 from jose import jwt
-from urllib.request import urlopen
+
+from .jwks import JWKSKeyStore
+from .token_cache import VerifiedTokenCache
+from .rbac import Requirement, all_of, grant
 
 
 AUTH0_DOMAIN = "dev-sec.us.auth0.com"
 ALGORITHMS = ["RS256"]
 API_AUDIENCE = "shop"
 
+# where the signing keys come from; point it at a local file or stub
+# server (e.g. file:///tmp/jwks.json) to run without Auth0
+JWKS_URL = os.environ.get(
+    "JWKS_URL", "https://{}/.well-known/jwks.json".format(AUTH0_DOMAIN)
+)
+jwks = JWKSKeyStore(JWKS_URL, ttl=int(os.environ.get("JWKS_TTL", 3600)))
+
+# payloads of tokens that already passed verify_decode_jwt
+verified_tokens = VerifiedTokenCache(
+    max_entries=int(os.environ.get("TOKEN_CACHE_ENTRIES", 10000)),
+    max_bytes=int(os.environ.get("TOKEN_CACHE_BYTES", 16 * 1024 * 1024)),
+)
+
 # AuthError Exception
 """
 AuthError Exception
@@ -51,22 +67,43 @@ def get_token_auth_header():
 
 """
     @INPUTS
-        permission: string permission (i.e. 'post:drink')
         payload: decoded jwt payload
 
     it should raise an AuthError if permissions are not included in the payload
         !!NOTE check your RBAC settings in Auth0
-    it should raise an AuthError if the requested permission string
-    is not in the payload permissions array
-    return true otherwise
+    return the frozenset of permissions the payload grants
 """
 
 
-def check_permissions(permission, payload):
+def granted_permissions(payload):
     if "permissions" not in payload:
         raise AuthError("Not Authorized", 401)
 
-    if permission not in payload["permissions"]:
+    return grant(payload["permissions"])
+
+
+"""
+    @INPUTS
+        permission: string permission (i.e. 'post:drink') or a Requirement
+            built with all_of() / any_of()
+        payload: decoded jwt payload
+        granted: the payload's granted_permissions(), if already known
+
+    it should raise an AuthError if permissions are not included in the payload
+        !!NOTE check your RBAC settings in Auth0
+    it should raise an AuthError if the requested permission is not granted
+    return true otherwise
+"""
+
+
+def check_permissions(permission, payload, granted=None):
+    if granted is None:
+        granted = granted_permissions(payload)
+
+    if not isinstance(permission, Requirement):
+        permission = all_of(permission)
+
+    if not permission.allows(granted):
         raise AuthError("Not Authorized", 401)
 
     return True
@@ -77,7 +114,7 @@ def check_permissions(permission, payload):
         token: a json web token (string)
 
     it should be an Auth0 token with key id (kid)
-    it should verify the token using Auth0 /.well-known/jwks.json
+    it should verify the token using the cached Auth0 /.well-known/jwks.json
     it should decode the payload from the token
     it should validate the claims
     return the decoded payload
@@ -85,25 +122,13 @@ def check_permissions(permission, payload):
 
 
 def verify_decode_jwt(token):
-    response = urlopen("https://{}/.well-known/jwks.json".format(AUTH0_DOMAIN))
-    jwks = json.loads(response.read())
-
     # Get the data in the header
     unverified_header = jwt.get_unverified_header(token)
-    rsa_key = {}
 
     if "kid" not in unverified_header:
         raise AuthError("Not Authorized", 401)
 
-    for key in jwks["keys"]:
-        if key["kid"] == unverified_header["kid"]:
-            rsa_key = {
-                "kty": key["kty"],
-                "kid": key["kid"],
-                "use": key["use"],
-                "n": key["n"],
-                "e": key["e"],
-            }
+    rsa_key = jwks.get_key(unverified_header["kid"])
 
     if rsa_key:
         try:
@@ -124,26 +149,57 @@ def verify_decode_jwt(token):
 
 """
     @INPUTS
-        permission: string permission (i.e. 'post:drink')
+        permission: string permission (i.e. 'post:drink'), a wildcard
+            scope (i.e. '*:drinks') or a Requirement built with
+            all_of() / any_of()
+        permissions: further permissions that are required as well
 
+    the permissions are compiled into a Requirement once, when the
+    route is decorated
     it should use the get_token_auth_header method to get the token
     it should use the verify_decode_jwt method to decode the jwt
+        unless the token was already verified and has not expired yet
     it should use the check_permissions method validate claims
     and check the requested permission
     return the decorator which passes the decoded payload
-    to the decorated method
+    to the decorated method; the token's permission set is available to
+    it through current_permissions()
+
+    EXAMPLE
+        @requires_auth("patch:drinks", "delete:drinks")
+        @requires_auth(any_of("post:drinks", "patch:drinks"))
 """
 
 
-def requires_auth(permission=""):
+def requires_auth(permission="", *permissions):
+    requirement = all_of(permission, *permissions)
+
     def requires_auth_decorator(f):
         @wraps(f)
         def wrapper(*args, **kwargs):
             token = get_token_auth_header()
-            payload = verify_decode_jwt(token)
-            check_permissions(permission, payload)
+            cached = verified_tokens.get(token)
+            if cached is None:
+                payload = verify_decode_jwt(token)
+                granted = granted_permissions(payload)
+                verified_tokens.put(token, payload, granted)
+            else:
+                payload, granted = cached
+            check_permissions(requirement, payload, granted)
+            _request_ctx_stack.top.granted_permissions = granted
             return f(payload, *args, **kwargs)
 
         return wrapper
 
     return requires_auth_decorator
+
+
+"""
+    return the frozenset of permissions of the token that passed
+    requires_auth for the current request, as cached with the verified
+    token, so routes can check further requirements without rebuilding it
+"""
+
+
+def current_permissions():
+    return _request_ctx_stack.top.granted_permissions
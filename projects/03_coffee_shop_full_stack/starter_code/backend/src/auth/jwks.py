@@ -0,0 +1,131 @@
+import json
+import logging
+import threading
+import time
+from urllib.request import urlopen
+
+logger = logging.getLogger(__name__)
+
+# JWK fields needed to verify an RS256 signature
+KEY_FIELDS = ("kty", "kid", "use", "n", "e")
+
+"""
+JWKSKeyStore
+    caches the signing keys of a JSON Web Key Set by kid
+
+    url can be any URL urlopen understands: the Auth0
+    /.well-known/jwks.json endpoint, a local stub server or a
+    file:// URL (a plain file path works too)
+
+    keys are kept for ttl seconds; a background thread fetches them
+    again refresh_margin seconds before they expire, and keeps serving
+    the old ones if the identity provider is slow or down.
+    an unknown kid triggers an immediate refetch (keys may have been
+    rotated) at most once every min_refetch_interval seconds
+    only one fetch runs at a time; requests that need keys while it
+    runs wait for it instead of failing
+"""
+
+
+class JWKSKeyStore:
+    def __init__(self, url, ttl=3600, refresh_margin=300,
+                 min_refetch_interval=30, timeout=5):
+        if "://" not in url:
+            url = "file://" + url
+        self.url = url
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.min_refetch_interval = min_refetch_interval
+        self.timeout = timeout
+
+        self.keys = {}
+        self.expires_at = 0
+        self.last_fetch = None
+        self.lock = threading.Lock()
+        # held for the whole of every fetch
+        self.fetch_lock = threading.Lock()
+        self.refresher = None
+
+    """
+    fetch()
+        downloads the key set and returns its keys by kid
+    """
+
+    def fetch(self):
+        response = urlopen(self.url, timeout=self.timeout)
+        jwks = json.loads(response.read())
+        return {
+            key["kid"]: {field: key[field] for field in KEY_FIELDS}
+            for key in jwks["keys"]
+        }
+
+    """
+    refresh()
+        replaces the cached keys with freshly fetched ones, after any
+        fetch already running has finished
+        returns False, keeping the old keys, if the fetch failed
+    """
+
+    def refresh(self):
+        with self.fetch_lock:
+            return self.load()
+
+    def load(self):
+        with self.lock:
+            self.last_fetch = time.monotonic()
+        try:
+            keys = self.fetch()
+        except Exception:
+            logger.exception("could not fetch the JWKS from %s", self.url)
+            return False
+
+        with self.lock:
+            self.keys = keys
+            self.expires_at = time.monotonic() + self.ttl
+        return True
+
+    def can_refetch(self):
+        return (
+            self.last_fetch is None
+            or time.monotonic() - self.last_fetch >= self.min_refetch_interval
+        )
+
+    """
+    get_key(kid)
+        returns the RSA key for kid, or None if the key set has no such key
+        the first call loads the keys and starts the background refresh
+    """
+
+    def get_key(self, kid):
+        if self.refresher is None:
+            self.start()
+
+        key = self.keys.get(kid)
+        if key is None or time.monotonic() >= self.expires_at:
+            with self.fetch_lock:
+                # a fetch that ran while this request waited may have
+                # brought the key
+                key = self.keys.get(kid)
+                expired = time.monotonic() >= self.expires_at
+                if (key is None or expired) and self.can_refetch():
+                    self.load()
+                    key = self.keys.get(kid)
+        return key
+
+    def start(self):
+        with self.lock:
+            if self.refresher is not None:
+                return
+            self.refresher = threading.Thread(
+                target=self.refresh_forever, name="jwks-refresh", daemon=True
+            )
+        with self.fetch_lock:
+            if self.last_fetch is None:
+                self.load()
+        self.refresher.start()
+
+    def refresh_forever(self):
+        while True:
+            delay = self.expires_at - self.refresh_margin - time.monotonic()
+            time.sleep(max(delay, self.min_refetch_interval))
+            self.refresh()
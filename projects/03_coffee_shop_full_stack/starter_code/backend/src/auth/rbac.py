@@ -0,0 +1,95 @@
+from fnmatch import fnmatchcase
+
+"""
+PERMISSIONS
+    every permission the API knows about, used to resolve wildcard
+    scopes such as '*:drinks' or 'get:*'
+"""
+PERMISSIONS = frozenset([
+    "get:drinks-detail",
+    "post:drinks",
+    "patch:drinks",
+    "delete:drinks",
+])
+
+
+"""
+expand(permission)
+    the known permissions a scope stands for
+    a plain permission stands for itself
+"""
+
+
+def expand(permission):
+    if "*" not in permission:
+        return frozenset([permission])
+    return frozenset(p for p in PERMISSIONS if fnmatchcase(p, permission))
+
+
+"""
+grant(permissions)
+    the frozenset of permissions a token holds
+    the token's permissions are taken literally: wildcards are only
+    resolved on the route side, so a token carrying '*:drinks' is not
+    granted every drinks permission
+    computed once per verified token
+"""
+
+
+def grant(permissions):
+    return frozenset(permissions)
+
+
+"""
+Requirement
+    a compiled permission expression
+    built once when a route is decorated; checking it against the
+    granted frozenset is a subset or intersection test
+
+    mode is "all" or "any"; items are permission strings (wildcards
+    allowed) or nested requirements
+"""
+
+
+class Requirement:
+    def __init__(self, mode, items):
+        if mode not in ("all", "any"):
+            raise ValueError("unknown requirement mode {!r}".format(mode))
+
+        permissions = set()
+        children = []
+        for item in items:
+            if isinstance(item, Requirement):
+                children.append(item)
+                continue
+            expanded = expand(item)
+            if not expanded:
+                raise ValueError(
+                    "{!r} matches no known permission".format(item)
+                )
+            permissions |= expanded
+
+        self.mode = mode
+        self.permissions = frozenset(permissions)
+        self.children = tuple(children)
+
+    def allows(self, granted):
+        if self.mode == "all":
+            return self.permissions <= granted and all(
+                child.allows(granted) for child in self.children
+            )
+        return not self.permissions.isdisjoint(granted) or any(
+            child.allows(granted) for child in self.children
+        )
+
+    def __repr__(self):
+        items = sorted(self.permissions) + list(self.children)
+        return "{}_of({})".format(self.mode, ", ".join(map(repr, items)))
+
+
+def all_of(*items):
+    return Requirement("all", items)
+
+
+def any_of(*items):
+    return Requirement("any", items)
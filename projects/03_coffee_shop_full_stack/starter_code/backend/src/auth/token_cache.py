@@ -0,0 +1,90 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+"""
+VerifiedTokenCache
+    remembers the decoded payload of tokens that passed verification,
+    along with the frozenset of permissions they grant, so a client
+    sending the same bearer token again skips the RS256 signature check,
+    the claims validation and the permission set construction
+
+    entries are keyed by the sha256 of the token, expire with the
+    token's exp claim and are evicted least recently used first once
+    there are more than max_entries of them or their payloads take up
+    more than max_bytes
+"""
+
+
+class VerifiedTokenCache:
+    def __init__(self, max_entries=10000, max_bytes=16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(token):
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    """
+    get(token)
+        returns the cached (payload, granted) of token, or None if it is
+        not cached or has expired
+    """
+
+    def get(self, token):
+        key = self.key(token)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            payload, granted, expires_at, size = entry
+            if expires_at <= time.time():
+                self.evict(key)
+                return None
+            self.entries.move_to_end(key)
+            return payload, granted
+
+    """
+    put(token, payload, granted)
+        caches a verified payload and its permissions until its exp claim
+        payloads without exp are not cached
+    """
+
+    def put(self, token, payload, granted):
+        expires_at = payload.get("exp")
+        if not isinstance(expires_at, (int, float)):
+            return
+
+        key = self.key(token)
+        # a rough measure of the memory the entry holds on to
+        size = len(key) + len(json.dumps(payload)) + sum(map(len, granted))
+        if size > self.max_bytes:
+            return
+
+        with self.lock:
+            self.evict(key)
+            self.entries[key] = (payload, granted, expires_at, size)
+            self.size += size
+            while (
+                len(self.entries) > self.max_entries
+                or self.size > self.max_bytes
+            ):
+                self.evict(next(iter(self.entries)))
+
+    def evict(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[3]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,77 @@
+import os
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+"""
+SQLITE_PRAGMAS
+    run on every new SQLite connection, in order
+
+    WAL lets readers keep going while one writer commits, and with
+    synchronous=NORMAL a commit no longer waits for an fsync (the
+    database stays consistent, the last commits can be lost on power
+    failure). busy_timeout makes a writer wait for the lock instead of
+    failing with "database is locked"
+"""
+SQLITE_PRAGMAS = [
+    ("journal_mode", os.environ.get("SQLITE_JOURNAL_MODE", "WAL")),
+    ("synchronous", os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")),
+    ("busy_timeout", int(os.environ.get("SQLITE_BUSY_TIMEOUT", 5000))),
+    ("mmap_size", int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 ** 2))),
+    ("foreign_keys", "ON"),
+]
+
+"""
+POOL_OPTIONS
+    the connection pool of each worker process
+    pre_ping checks a connection is alive before handing it out, and
+    connections older than recycle seconds are replaced, so connections
+    dropped by the server or a proxy never reach a request
+"""
+POOL_OPTIONS = {
+    "pool_size": int(os.environ.get("DB_POOL_SIZE", 5)),
+    "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", 10)),
+    "pool_timeout": int(os.environ.get("DB_POOL_TIMEOUT", 30)),
+    "pool_pre_ping": os.environ.get("DB_POOL_PRE_PING", "1") == "1",
+    "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", 1800)),
+}
+
+
+"""
+engine_options(url)
+    the create_engine() arguments for a database url
+    SQLite files get a pool too, so the pragmas run once per connection
+    rather than on every checkout
+"""
+
+
+def engine_options(url):
+    if url.startswith("sqlite"):
+        if url in ("sqlite://", "sqlite:///:memory:"):
+            return {}
+        return {
+            "poolclass": QueuePool,
+            "pool_size": POOL_OPTIONS["pool_size"],
+            "max_overflow": POOL_OPTIONS["max_overflow"],
+            "pool_timeout": POOL_OPTIONS["pool_timeout"],
+            "connect_args": {"check_same_thread": False},
+        }
+    return dict(POOL_OPTIONS)
+
+
+"""
+apply_sqlite_pragmas(engine)
+    runs SQLITE_PRAGMAS on each connection the engine opens
+    does nothing for other databases
+"""
+
+
+def apply_sqlite_pragmas(engine):
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in SQLITE_PRAGMAS:
+            cursor.execute("PRAGMA {} = {}".format(name, value))
+        cursor.close()
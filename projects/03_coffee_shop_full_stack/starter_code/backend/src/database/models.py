@@ -1,26 +1,37 @@
 import os
-from sqlalchemy import Column, String, Integer
+from sqlalchemy import Column, String, Integer, JSON, inspect
+from sqlalchemy.orm import validates
 from flask_sqlalchemy import SQLAlchemy
 import json
 
+from .engine import apply_sqlite_pragmas, engine_options
+
 database_filename = "database.db"
 project_dir = os.path.dirname(os.path.abspath(__file__))
-database_path = "sqlite:///{}".format(
-        os.path.join(project_dir, database_filename))
+# set DATABASE_URL (e.g. postgresql://localhost/coffee) to use another
+# database; see engine.py for the pool and SQLite settings
+database_path = os.environ.get(
+    "DATABASE_URL",
+    "sqlite:///{}".format(os.path.join(project_dir, database_filename)),
+)
 
 db = SQLAlchemy()
 
 """
 setup_db(app)
     binds a flask application and a SQLAlchemy service
+    configures the engine with the profile from engine.py
 """
 
 
 def setup_db(app):
     app.config["SQLALCHEMY_DATABASE_URI"] = database_path
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(database_path)
     db.app = app
     db.init_app(app)
+    with app.app_context():
+        apply_sqlite_pragmas(db.get_engine())
 
 
 """
@@ -35,6 +46,82 @@ def db_drop_and_create_all():
     db.create_all()
 
 
+"""
+migrate_recipe_json()
+    upgrades a database created when the recipe was a String(180) blob:
+    turns recipe into a JSON column on Postgres (SQLite keeps JSON as
+    text already), adds the short_recipe column and fills it in
+    safe to run more than once
+"""
+
+
+def migrate_recipe_json():
+    engine = db.get_engine()
+    columns = {c["name"] for c in inspect(engine).get_columns("drink")}
+    if "short_recipe" in columns:
+        return
+
+    with engine.begin() as connection:
+        if engine.dialect.name == "postgresql":
+            connection.execute(
+                "ALTER TABLE drink ALTER COLUMN recipe TYPE JSON "
+                "USING recipe::json"
+            )
+        connection.execute("ALTER TABLE drink ADD COLUMN short_recipe JSON")
+
+    for drink in Drink.query.all():
+        drink.recipe = drink.recipe
+    db.session.commit()
+
+
+"""
+shorten_recipe(recipe)
+    the recipe without ingredient names, as stored in short_recipe
+"""
+
+
+def shorten_recipe(recipe):
+    return [{"color": r["color"], "parts": r["parts"]} for r in recipe]
+
+
+"""
+apply_drink_batch(creates, updates, deletes)
+    applies many drink changes in a single transaction
+    creates and updates are lists of column dicts (updates include the
+    id), deletes is a list of ids; every row is written with one bulk
+    statement per kind instead of a commit per drink
+    deletes run first and creates last, so a batch can delete or rename
+    a drink and reuse its title
+    short_recipe is derived for any dict that sets recipe
+    returns the ids of the created drinks, in order
+    rolls back and re-raises if any statement fails
+"""
+
+
+def apply_drink_batch(creates, updates, deletes):
+    for row in creates + updates:
+        if "recipe" in row:
+            row["short_recipe"] = shorten_recipe(row["recipe"])
+
+    try:
+        if deletes:
+            Drink.query.filter(Drink.id.in_(deletes)).delete(
+                synchronize_session=False
+            )
+        if updates:
+            db.session.bulk_update_mappings(Drink, updates)
+        if creates:
+            db.session.bulk_insert_mappings(
+                Drink, creates, return_defaults=True
+            )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return [row["id"] for row in creates]
+
+
 """
 Drink
 a persistent drink entity, extends the base SQLAlchemy Model
@@ -46,10 +133,18 @@ class Drink(db.Model):
     id = Column(Integer().with_variant(Integer, "sqlite"), primary_key=True)
     # String Title
     title = Column(String(80), unique=True)
-    # the ingredients blob - this stores a lazy json blob
+    # the ingredients, parsed once when the row is loaded
     # the required datatype is
     # [{'color': string, 'name':string, 'parts':number}]
-    recipe = Column(String(180), nullable=False)
+    recipe = Column(JSON, nullable=False)
+    # the recipe without ingredient names, derived whenever recipe is set
+    # so listing drinks never has to load or reshape the full recipe
+    short_recipe = Column(JSON, nullable=False)
+
+    @validates("recipe")
+    def derive_short_recipe(self, key, recipe):
+        self.short_recipe = shorten_recipe(recipe)
+        return recipe
 
     """
     short()
@@ -57,12 +152,11 @@ class Drink(db.Model):
     """
 
     def short(self):
-        print(json.loads(self.recipe))
-        short_recipe = [
-            {"color": r["color"], "parts": r["parts"]} for r in
-            json.loads(self.recipe)
-        ]
-        return {"id": self.id, "title": self.title, "recipe": short_recipe}
+        return {
+            "id": self.id,
+            "title": self.title,
+            "recipe": self.short_recipe
+        }
 
     """
     long()
@@ -73,7 +167,7 @@ class Drink(db.Model):
         return {
             "id": self.id,
             "title": self.title,
-            "recipe": json.loads(self.recipe)
+            "recipe": self.recipe
         }
 
     """
@@ -84,6 +178,7 @@ class Drink(db.Model):
         EXAMPLE
             drink = Drink(title=req_title, recipe=req_recipe)
             drink.insert()
+        where req_recipe is the list of ingredients, not a json string
     """
 
     def insert(self):
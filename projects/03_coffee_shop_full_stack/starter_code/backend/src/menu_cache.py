@@ -0,0 +1,52 @@
+import hashlib
+import threading
+import time
+
+"""
+MenuCache
+    holds the serialized GET /drinks response and its strong ETag
+
+    the body is built by build() at most once per menu version: the
+    create, update and delete endpoints call bump() after they commit,
+    and every other request is served from memory
+    writes made by other worker processes are picked up once the body
+    is older than ttl seconds
+"""
+
+
+class MenuCache:
+    def __init__(self, build, ttl=60):
+        self.build = build
+        self.ttl = ttl
+        self.version = 0
+        self.lock = threading.Lock()
+        self.entry = None
+
+    """
+    bump()
+        marks the cached menu as out of date
+    """
+
+    def bump(self):
+        with self.lock:
+            self.version += 1
+
+    """
+    get()
+        returns (body, etag) of the current menu
+    """
+
+    def get(self):
+        entry = self.entry
+        if (
+            entry is not None
+            and entry[0] == self.version
+            and time.monotonic() - entry[1] < self.ttl
+        ):
+            return entry[2], entry[3]
+
+        version = self.version
+        body = self.build()
+        etag = hashlib.sha1(body).hexdigest()
+        self.entry = (version, time.monotonic(), body, etag)
+        return body, etag
@@ -0,0 +1,75 @@
+"""Tests for POST /drinks/batch, run against a throwaway SQLite database.
+
+    python -m unittest test_batch
+
+Tokens are signed with the throwaway key bench.py sets up.
+"""
+import unittest
+
+from bench import make_token
+from src.api import app
+from src.database.models import db, Drink
+
+HEADERS = {
+    "Authorization": "Bearer "
+    + make_token(["post:drinks", "patch:drinks", "delete:drinks"])
+}
+RECIPE = [{"name": "water", "color": "blue", "parts": 1}]
+
+
+class BatchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            for title in ("A1", "A2", "A3"):
+                Drink(title=title, recipe=RECIPE).insert()
+
+    def batch(self, operations):
+        response = self.client.post(
+            "/drinks/batch", headers=HEADERS, json={"operations": operations}
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()["results"]
+
+    def titles(self):
+        with app.app_context():
+            return {drink.id: drink.title for drink in Drink.query}
+
+    def test_rename_chain(self):
+        # each title is freed by the rename before the one reusing it
+        results = self.batch([
+            {"op": "update", "id": 2, "title": "X"},
+            {"op": "update", "id": 1, "title": "A2"},
+            {"op": "update", "id": 3, "title": "A1"},
+            {"op": "create", "title": "A3", "recipe": RECIPE},
+        ])
+
+        self.assertTrue(all(result["success"] for result in results))
+        self.assertEqual(
+            self.titles(), {1: "A2", 2: "X", 3: "A1", 4: "A3"}
+        )
+
+    def test_rename_before_title_is_freed(self):
+        results = self.batch([
+            {"op": "update", "id": 2, "title": "A1"},
+            {"op": "update", "id": 1, "title": "X"},
+        ])
+
+        self.assertEqual(results[0]["error"], 422)
+        self.assertTrue(results[1]["success"])
+        self.assertEqual(self.titles(), {1: "X", 2: "A2", 3: "A3"})
+
+    def test_reuse_deleted_title(self):
+        results = self.batch([
+            {"op": "update", "id": 2, "title": "A1"},
+            {"op": "delete", "id": 1},
+        ])
+
+        self.assertTrue(all(result["success"] for result in results))
+        self.assertEqual(self.titles(), {2: "A1", 3: "A3"})
+
+
+if __name__ == "__main__":
+    unittest.main()